@@ -0,0 +1,155 @@
+"""Decision tree search with cutoffs and iterative deepening.
+
+This searches the same tree as `decision_tree.make_decision', with a cutoff at a won
+estimate: the rival follows a fixed policy in the tree, so every node that branches
+maximises our estimate, and a node returns as soon as one of its moves reaches the best
+possible estimate, 1.0 (see the cutoff parameter of `decision_tree.make_decision').
+Ties between equal estimates are broken in favour of the first move tried, so both give
+exactly the same results.
+
+A search may be limited by a `Budget'.  `deepening_decision' uses that to search as deep
+as the budget allows.
+"""
+
+import time
+
+import decision_tree
+from cardset import beaters, matching, iterate
+from decision_tree import WIN, unbeatables_variants
+
+
+# Depth limit of `deepening_decision'
+MAX_DEEPENING = 20
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class Budget:
+    """Limit on a search: wall time in seconds and/or number of nodes"""
+    # How often to look at the clock, in nodes
+    CLOCK_PERIOD = 64
+
+    def __init__(self, seconds=None, nodes=None):
+        self.seconds = seconds
+        self.nodes = nodes
+        self.deadline = self.nodes_left = self.clock_countdown = None
+
+    def start(self):
+        if self.seconds is not None:
+            self.deadline = time.perf_counter() + self.seconds
+        self.nodes_left = self.nodes
+        self.clock_countdown = self.CLOCK_PERIOD
+
+    def spend(self):
+        """Account for 1 node, raise BudgetExhausted if there's no more budget"""
+        if self.nodes_left is not None:
+            self.nodes_left -= 1
+            if self.nodes_left < 0:
+                raise BudgetExhausted
+        if self.deadline is not None:
+            self.clock_countdown -= 1
+            if self.clock_countdown == 0:
+                self.clock_countdown = self.CLOCK_PERIOD
+                if time.perf_counter() > self.deadline:
+                    raise BudgetExhausted
+
+
+def make_decision(levels, fn, budget=None):
+    """Same as `decision_tree.make_decision', with cutoffs
+
+    If budget is given, BudgetExhausted is raised when it is exhausted.
+    """
+    return decision_tree.make_decision(levels, fn, budget, cutoff=True)
+
+
+def make_decision_fns(levels, budget=None):
+    """Dict of all the decision tree functions at given depth, with cutoffs"""
+    return decision_tree.make_decision_fns(levels, budget, cutoff=True)
+
+
+def make_offense_decision(levels, c_off, c_def, iattack, budget=None):
+    """Same as `decision_tree.make_offense_decision', with cutoffs"""
+    return decision_tree.make_offense_decision(levels, c_off, c_def, iattack, budget,
+                                               cutoff=True)
+
+
+def root_variants(fn, c_off, c_def, t_off, t_def, offcard=None):
+    """List of (move, child, args) for the root of a decision `fn'
+
+    child is the name of the function that estimates the move, or None if the move ends
+    the strike and the estimate is `make_offense_decision' of the next level.
+    """
+    if fn == 'i_attack':
+        suitable = matching(c_off, t_off | t_def) if t_off else c_off
+        variants = [
+            (c, 'rival_defends', (c_off ^ c, c_def, t_off | c, t_def, c))
+            for c in iterate(suitable)
+        ]
+        if t_off:
+            variants.append((None, None, (c_def, c_off, False)))
+    elif fn == 'i_defend':
+        variants = [
+            (c, 'rival_attacks', (c_off, c_def ^ c, t_off, t_def | c))
+            for c in iterate(beaters(c_def, offcard))
+        ]
+        variants.append((None, 'rival_puts_unbeatables', (c_off, c_def, t_off, t_def)))
+    elif fn == 'i_put_unbeatables':
+        variants = [
+            (unb, None, (c_off & ~unb, c_def | t_off | t_def | unb, True))
+            for unb in unbeatables_variants(c_off, c_def, t_off, t_def)
+        ]
+    else:
+        raise ValueError("Not a decision: {}".format(fn))
+
+    return variants
+
+
+def deepening_decision(fn, position, budget, max_levels=MAX_DEEPENING):
+    """Search 1, 2, ... levels deep while the budget lasts
+
+    The best moves of a depth are tried first at the next one.  Ties are still broken
+    in favour of the weakest move, so each depth gives the result of `make_decision'.
+
+    :param fn: decision function name, as for `make_decision'
+    :param position: arguments of the decision function
+    :return: (estimate, bestmove, levels) from the deepest finished search.  1 level is
+    always searched to the end, regardless of the budget.
+    """
+    variants = root_variants(fn, *position)
+    order = list(range(len(variants)))
+    budget.start()
+    result = None
+
+    for levels in range(1, max_levels + 1):
+        fns = make_decision_fns(levels, budget if levels > 1 else None)
+
+        def estimate(i):
+            move, child, args = variants[i]
+            if child is None:
+                return make_offense_decision(levels - 1, *args, budget=budget)[0]
+            else:
+                return fns[child](*args)[0]
+
+        estimates = {}  # variant index -> estimate
+        try:
+            for i in order:
+                estimates[i] = estimate(i)
+                if estimates[i] >= WIN:
+                    # Cut off, but a weaker move that also wins must be preferred
+                    for j in range(i):
+                        if j not in estimates:
+                            estimates[j] = estimate(j)
+                            if estimates[j] >= WIN:
+                                break
+                    break
+        except BudgetExhausted:
+            break
+
+        best = max(estimates, key=lambda i: (estimates[i], -i))
+        result = estimates[best], variants[best][0], levels
+        # Moves cut off are tried last
+        order.sort(key=lambda i: -estimates.get(i, -1.0))
+
+    return result
@@ -0,0 +1,277 @@
+"""Analysis of game logs (see `gamelog') with NumPy.
+
+A log is loaded into `Games': one array per field of the games, the events stay in
+the (memory-mapped) log and are processed in chunks of games.  Everything is computed
+for all games at once, so logs of millions of games take seconds:
+
+    games = load('games.log')
+    win_rates(games, trump_count(games))
+    win_rates(games, strength_bucket(mean_strength(games)))
+    d = defences(games); d.beatable[d.defcard < 0].mean()   # beatable cards taken
+
+Run as: python analytics.py LOG
+"""
+
+from argparse import ArgumentParser
+from collections import namedtuple
+
+import numpy as np
+
+from cardset import FIRST_TRUMP_BIT, BEATEN_BY, CARDS
+from common import NCARDS_PLAYER, SUITS, deckset, game_context
+from gamelog import MAGIC, RECORD, DEAL_SIZE, OFFENCE, DEFENCE, UNBEATABLE,\
+    REPLENISHMENT
+
+
+# Games processed at once by event analyses
+CHUNK = 1 << 16
+
+HEADER = np.dtype([
+    ('seed', '<i8'), ('number', '<u4'), ('trump', 'u1'), ('result', 'u1'),
+    ('nevents', '<u2'),
+])
+assert HEADER.itemsize == RECORD.size
+
+# Card index -> `common.card_value' (the same for all trumps: indices are
+# trump-relative)
+VALUES = np.zeros(len(CARDS), np.int64)
+for card in deckset:
+    VALUES[game_context(SUITS[0]).index[card]] = game_context(SUITS[0]).card_value(card)
+
+# Card index -> its bit, and the same for card index + 1 (0: no card)
+BITS = np.array(CARDS, np.uint64)
+CODE_BITS = np.array((0,) + CARDS, np.uint64)
+
+# Card index -> bits of the cards that beat it
+BEATERS = np.array([BEATEN_BY[card] for card in CARDS], np.uint64)
+
+# Upper bounds of the buckets of `strength_bucket', the last one is unbounded
+STRENGTH_EDGES = (13, 16, 19, 22)
+
+
+Games = namedtuple('Games', ('seed', 'number', 'trump', 'result', 'deal', 'data',
+                             'starts', 'nevents'))
+Games.__doc__ = """Columns of n games
+
+seed, number: as recorded (see `gamelog.Recorder')
+trump: suit index in `common.SUITS'
+result: 0 draw, 1 the 1st player wins, 2 the 2nd one wins
+deal: (n, 36) card indices, as in `gamelog'
+data: bytes the games are in (uint8 array)
+starts: offsets of the events of the games in data
+nevents: numbers of events
+"""
+
+Defences = namedtuple('Defences', ('game', 'defender', 'offcard', 'defcard',
+                                   'beatable'))
+Defences.__doc__ = """Columns of the defensive moves of games
+
+game: index of the game in `Games'
+defender: 0 or 1, the player
+offcard: index of the card to beat
+defcard: index of the card it was beaten with, -1 if the defender took
+beatable: whether the defender had a card to beat it
+"""
+
+Groups = namedtuple('Groups', ('key', 'games', 'wins', 'draws', 'losses', 'score'))
+
+
+def load(path):
+    """`Games' of a log"""
+    data = np.memmap(path, np.uint8, 'r')
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a game log: {}".format(path))
+    offsets = np.fromfile(path + '.idx', '<u8').astype(np.int64)
+    return _columns(data, offsets)
+
+
+def from_records(records):
+    """`Games' of records of `gamelog.Recorder', in memory"""
+    records = list(records)
+    data = np.frombuffer(b''.join(records), np.uint8)
+    offsets = np.zeros(len(records), np.int64)
+    np.cumsum([len(r) for r in records[:-1]], out=offsets[1:])
+    return _columns(data, offsets)
+
+
+def _columns(data, offsets):
+    header_size = RECORD.size + DEAL_SIZE
+    n = len(offsets)
+    headers = np.empty(n, HEADER)
+    deal = np.empty((n, DEAL_SIZE), np.uint8)
+    for i in range(0, n, CHUNK):
+        records = data[offsets[i:i + CHUNK, None] + np.arange(header_size)]
+        headers[i:i + CHUNK] = records[:, :RECORD.size].copy().view(HEADER)[:, 0]
+        deal[i:i + CHUNK] = records[:, RECORD.size:]
+
+    return Games(
+        headers['seed'], headers['number'], headers['trump'], headers['result'], deal,
+        data, offsets + header_size, headers['nevents'].astype(np.int64)
+    )
+
+
+def hand(games, player=0):
+    """(n, 6) card indices dealt to the player"""
+    return games.deal[:, player * NCARDS_PLAYER:(player + 1) * NCARDS_PLAYER]
+
+
+def trump_count(games, player=0):
+    """Number of trumps dealt to the player"""
+    return (hand(games, player) >= FIRST_TRUMP_BIT).sum(axis=1)
+
+
+def mean_strength(games, player=0):
+    """Mean card value of the hand dealt to the player (see `common.mean_cardvalue')"""
+    return VALUES[hand(games, player)].mean(axis=1)
+
+
+def strength_bucket(strength, edges=STRENGTH_EDGES):
+    """Bucket number of every strength: 0 if < edges[0], 1 if < edges[1], ..."""
+    return np.digitize(strength, edges)
+
+
+def aggregate(key, values):
+    """Return (distinct keys, counts, sums of values)"""
+    keys, inverse = np.unique(key, return_inverse=True)
+    return (
+        keys,
+        np.bincount(inverse, minlength=len(keys)),
+        np.bincount(inverse, values, minlength=len(keys))
+    )
+
+
+def win_rates(games, key):
+    """`Groups' of games by key (array of n), the score is of the 1st player
+
+    The score is the share of decisive games won (see `results').
+    """
+    keys, counts, wins = aggregate(key, games.result == 1)
+    wins = wins.astype(np.int64)
+    draws = aggregate(key, games.result == 0)[2].astype(np.int64)
+    losses = counts - wins - draws
+    decisive = wins + losses
+    score = np.divide(wins, decisive, out=np.full(len(keys), 0.5), where=decisive > 0)
+    return Groups(keys, counts, wins, draws, losses, score)
+
+
+def format_groups(groups, name):
+    lines = ["{:>8} {:>10} {:>10} {:>10} {:>10} {:>7}".format(
+        name, 'games', 'wins', 'draws', 'losses', 'score'
+    )]
+    for row in zip(*groups):
+        lines.append("{:>8} {:>10} {:>10} {:>10} {:>10} {:>7.2%}".format(*row))
+    return '\n'.join(lines)
+
+
+def defences(games):
+    """`Defences' of all games, replayed from their events"""
+    parts = [_replay(games, first, min(first + CHUNK, len(games.seed)))[1]
+             for first in range(0, len(games.seed), CHUNK)]
+    if not parts:
+        return Defences(*[np.zeros(0, np.int64)] * len(Defences._fields))
+    columns = [np.concatenate(column) for column in zip(*parts)]
+    order = np.argsort(columns[0], kind='stable')
+    return Defences(*(column[order] for column in columns))
+
+
+def final_hands(games):
+    """(2, n) card sets (bits) of the players at the end of games"""
+    parts = [_replay(games, first, min(first + CHUNK, len(games.seed)))[0]
+             for first in range(0, len(games.seed), CHUNK)]
+    if not parts:
+        return np.zeros((2, 0), np.uint64)
+    return np.concatenate(parts, axis=1)
+
+
+def _replay(games, first, stop):
+    """Replay games first, ..., stop - 1 event by event, all of them at once
+
+    Return (final hands, list of `Defences' columns by event number).  The games are
+    sorted longest first, so the event number i is in the first active[i] of them.
+    """
+    order = first + np.argsort(-games.nevents[first:stop], kind='stable')
+    nevents = games.nevents[order]
+    starts = games.starts[order]
+    width = int(nevents[0]) if len(order) else 0
+    active = np.searchsorted(-nevents, -np.arange(width))
+
+    deal = games.deal[order]
+    hands = [np.bitwise_or.reduce(BITS[deal[:, :NCARDS_PLAYER]], axis=1),
+             np.bitwise_or.reduce(BITS[deal[:, NCARDS_PLAYER:2 * NCARDS_PLAYER]], axis=1)]
+    second = np.zeros(len(order), bool)  # the 2nd player attacks
+    table = np.zeros(len(order), np.uint64)
+    offcard = np.zeros(len(order), np.int64)
+    survived = np.ones(len(order), bool)
+    markers = np.zeros(len(order), np.int64)  # REPLENISHMENT markers of this strike
+    result = []
+
+    def give(to_second, bits, op):
+        op(h0, np.where(to_second, 0, bits), out=h0)
+        op(h1, np.where(to_second, bits, 0), out=h1)
+
+    for i, k in enumerate(active):
+        h0, h1, att, tb, sv, mk, oc = (
+            a[:k] for a in (hands[0], hands[1], second, table, survived, markers, offcard)
+        )
+        code = games.data[starts[:k] + i]
+        kind = code >> 6
+        code &= 0x3f
+        bit = CODE_BITS[code]
+
+        new = (kind != REPLENISHMENT) & (mk > 0)
+        att ^= new & sv
+        tb[new] = 0
+        sv |= new
+        mk[new] = 0
+
+        offence = kind == OFFENCE
+        give(att, np.where(offence, bit, 0), np.bitwise_xor)
+        tb |= np.where(offence, bit, 0)
+        np.copyto(oc, code.astype(np.int64) - 1, where=offence & (code > 0))
+
+        defence = kind == DEFENCE
+        j = np.flatnonzero(defence)
+        defhand = np.where(att[j], h0[j], h1[j])
+        result.append((
+            order[j], att[j] ^ 1, oc[j], code[j].astype(np.int64) - 1,
+            defhand & BEATERS[oc[j]] != 0
+        ))
+        give(~att, np.where(defence, bit, 0), np.bitwise_xor)
+        tb |= np.where(defence, bit, 0)
+        take = defence & (code == 0)
+        sv &= ~take
+        give(~att, np.where(take, tb, 0), np.bitwise_or)
+
+        unbeatable = np.where(kind == UNBEATABLE, bit, 0)
+        give(att, unbeatable, np.bitwise_xor)
+        give(~att, unbeatable, np.bitwise_or)
+
+        replenishment = kind == REPLENISHMENT
+        mk += replenishment & (code == 0)
+        give(att == (mk == 1), np.where(replenishment, bit, 0), np.bitwise_or)
+
+    final = np.empty((2, len(order)), np.uint64)
+    final[:, order - first] = hands
+    return final, [np.concatenate(column) for column in zip(*result)] if result else \
+        [np.zeros(0, np.int64)] * len(Defences._fields)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('log', help="game log (see `gamelog')")
+    args = parser.parse_args()
+
+    games = load(args.log)
+    print(len(games.seed), "games")
+    print(format_groups(win_rates(games, trump_count(games)), 'trumps'))
+    print(format_groups(win_rates(games, strength_bucket(mean_strength(games))),
+                        'strength'))
+    d = defences(games)
+    taken = d.defcard < 0
+    print("Defences: {}, taken: {:.2%}, taken though beatable: {:.2%}".format(
+        len(d.game), taken.mean(), d.beatable[taken].mean()
+    ))
+
+
+if __name__ == '__main__':
+    main()
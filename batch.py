@@ -0,0 +1,273 @@
+"""Batch game engine: fast self-play of the dumb and smart strategies.
+
+`game.rungame' drives player generators one card at a time.  Here, a game is a plain
+loop over card sets (see `cardset'), and a strategy is a `Policy': a triple of functions
+that make decisions from the state of the game.  The policies make exactly the same
+decisions as the corresponding scenarios, so on the same deals the results are the same
+as those of `rungame'.
+
+Deals are stored as a flat array of card indices, 36 per game, in the order the cards
+are dealt: 6 cards of the 1st player, 6 cards of the 2nd one, then the deck.
+
+`lockstep' plays the same policies on NumPy arrays, all the games of a batch at once.
+"""
+
+import random
+from array import array
+from collections import Counter, namedtuple
+from itertools import takewhile
+
+from cardset import CARDS, FULL, NUM_CARDS, VALUE, beaters, matching, unbeatables,\
+    iterate, index_of, size, total_value, mean_value
+from common import NCARDS_PLAYER, SUITS, encoding, random_deck, random_suit,\
+    game_random
+
+
+# A strategy.  The functions are:
+#   attack(hand, toff, tdef, nrival, blackset) -> card or None
+#   defend(hand, offcard, table, blackset) -> card or None
+#   give(hand, table, nrival, blackset) -> card set of unbeatables
+# where blackset is the set of cards the player has not seen so far, or 0 if the deck is
+# empty (then the player knows the hand of the rival).  nrival is the number of cards
+# of the rival, offcard is already on the table.  If `informed' is false, the policy
+# does not use blackset, and it is always passed as 0.
+Policy = namedtuple('Policy', ('attack', 'defend', 'give', 'informed'))
+
+
+def dumb_attack(hand, toff, tdef, nrival, blackset):
+    if toff:
+        hand = matching(hand, toff | tdef)
+        if not hand:
+            return None
+    return hand & -hand
+
+
+def dumb_defend(hand, offcard, table, blackset):
+    suitable = beaters(hand, offcard)
+    return suitable & -suitable if suitable else None
+
+
+def dumb_give(hand, table, nrival, blackset):
+    return unbeatables(hand, table, nrival - 1)
+
+
+DUMB = Policy(dumb_attack, dumb_defend, dumb_give, False)
+
+
+def smart_attack(hand, toff, tdef, nrival, blackset):
+    if not toff:
+        return hand & -hand
+    suitable = matching(hand, toff | tdef)
+    if not suitable:
+        return None
+    card = suitable & -suitable
+    if not blackset or VALUE[card] <= mean_value(blackset):
+        return card
+    else:
+        return None
+
+
+def smart_defend(hand, offcard, table, blackset):
+    suitable = beaters(hand, offcard)
+    if not suitable:
+        return None
+    card = suitable & -suitable
+    if blackset:
+        # Give up if the cards we'd have after beating are weaker than the ones we'd take
+        giveup_mean = mean_value(table | hand)
+        n_old = size(hand) - 1
+        n_new = max(0, NCARDS_PLAYER - n_old)
+        black_mean = mean_value(blackset)
+        beat_mean = (total_value(hand ^ card) + black_mean * n_new) / (n_old + n_new)
+        if giveup_mean > beat_mean:
+            return None
+    return card
+
+
+def smart_give(hand, table, nrival, blackset):
+    unb = unbeatables(hand, table, nrival - 1)
+    if blackset:
+        black_mean = mean_value(blackset)
+        unb = sum(takewhile(lambda c: VALUE[c] <= black_mean, iterate(unb)))
+    return unb
+
+
+SMART = Policy(smart_attack, smart_defend, smart_give, True)
+
+POLICIES = {
+    'dumb': DUMB,
+    'smart': SMART,
+}
+
+
+# Where a strike is: the attacker is to attack, the defender is to beat offcard, or the
+# attacker is to give unbeatables
+ATTACK, DEFEND, GIVE = range(3)
+
+# No move given to `playout'
+NO_MOVE = object()
+
+
+def play(deck, policy1, policy2):
+    """Play a game on the dealt deck (list of cards), return as `game.rungame' does"""
+    hands = [sum(deck[:NCARDS_PLAYER]), sum(deck[NCARDS_PLAYER:2 * NCARDS_PLAYER])]
+    return playout(
+        (policy1, policy2), hands, deck, 2 * NCARDS_PLAYER, 0, [0, 0], 0
+    )
+
+
+def rollout(state, policy1, policy2):
+    """Play a game on from a `game.GameState' (not modified), return as `game.rungame'
+    does"""
+    top = NUM_CARDS - len(state.deck)
+    return playout(
+        (policy1, policy2), list(state.hands), [0] * top + state.deck, top,
+        state.attacker, list(state.known), state.discard
+    )
+
+
+def playout(policies, hands, deck, top, att, known, discard,
+            toff=0, tdef=0, phase=ATTACK, offcard=None, move=NO_MOVE):
+    """Play a game from the given state to the end
+
+    :param policies: policies of players 0 and 1
+    :param hands: list of the card sets of players 0 and 1 (modified)
+    :param deck: list of cards, deck[top] is the top card of the deck
+    :param att: the attacking player, 0 or 1
+    :param known: list of the cards that players 0 and 1 took from the table and still
+    have (modified)
+    :param discard: the beaten off cards
+    :param toff, tdef, phase, offcard: state of the current strike; offcard is on the
+    table and is to be beaten if phase is DEFEND
+    :param move: if given, it is made in the 1st decision (phase) instead of asking the
+    policy
+    :return: True if player 0 wins, False if player 1 wins, None if draw
+    """
+    while True:
+        dfn = 1 - att
+        attack, _, give, att_informed = policies[att]
+        defend, def_informed = policies[dfn].defend, policies[dfn].informed
+        att_informed = att_informed and top < NUM_CARDS
+        def_informed = def_informed and top < NUM_CARDS
+        coff, cdef = hands[att], hands[dfn]
+        survived = True
+
+        while coff and cdef or phase != ATTACK:  # strike loop
+            table = toff | tdef
+            if phase == ATTACK:
+                if move is not NO_MOVE:
+                    offcard, move = move, NO_MOVE
+                else:
+                    if att_informed:
+                        blackset = FULL & ~(coff | discard | table | known[dfn])
+                    else:
+                        blackset = 0
+                    offcard = attack(coff, toff, tdef, size(cdef), blackset)
+                if offcard is None:
+                    break
+                coff ^= offcard
+                toff |= offcard
+                table |= offcard
+                known[att] &= ~offcard
+                phase = DEFEND
+
+            if phase == DEFEND:
+                if move is not NO_MOVE:
+                    defcard, move = move, NO_MOVE
+                else:
+                    if def_informed:
+                        blackset = FULL & ~(cdef | discard | table | known[att])
+                    else:
+                        blackset = 0
+                    defcard = defend(cdef, offcard, table, blackset)
+                if defcard is None:
+                    phase = GIVE
+                else:
+                    cdef ^= defcard
+                    tdef |= defcard
+                    known[dfn] &= ~defcard
+                    phase = ATTACK
+
+            if phase == GIVE:
+                if move is not NO_MOVE:
+                    unb, move = move, NO_MOVE
+                else:
+                    if att_informed:
+                        blackset = FULL & ~(coff | discard | table | known[dfn])
+                    else:
+                        blackset = 0
+                    unb = give(coff, table, size(cdef), blackset)
+                coff &= ~unb
+                known[att] &= ~unb
+                cdef |= table | unb
+                known[dfn] |= table | unb
+                survived = False
+                break
+
+        if survived:
+            discard |= toff | tdef
+        toff = tdef = 0
+        phase = ATTACK
+
+        if top < NUM_CARDS:
+            n = min(NUM_CARDS - top, max(0, NCARDS_PLAYER - size(coff)))
+            coff |= sum(deck[top:top + n])
+            top += n
+            n = min(NUM_CARDS - top, max(0, NCARDS_PLAYER - size(cdef)))
+            cdef |= sum(deck[top:top + n])
+            top += n
+
+        if not coff or not cdef:
+            if not coff and not cdef:
+                return None
+            elif not coff:
+                return att == 0
+            else:
+                return att == 1
+
+        hands[att], hands[dfn] = coff, cdef
+        if survived:
+            att = dfn
+
+
+# trump -> {Card: card index}
+_indices = {
+    suit: {card: index_of(bit) for card, bit in encoding(suit).bit_of.items()}
+    for suit in SUITS
+}
+
+
+def deal(n, seed=None, first=0):
+    """Deal n games the same way `game.new_game' does
+
+    :param seed: if given, game number i is dealt with `common.game_random(seed, i)',
+    for i starting from `first'.  Otherwise the random module is used.
+    :return: (decks, trumps): arrays of card indices (36 per game) and of trump suit
+    indices (see `common.SUITS').
+    """
+    decks = array('B')
+    trumps = array('B')
+    rng = random
+    for i in range(first, first + n):
+        if seed is not None:
+            rng = game_random(seed, i)
+        deck = random_deck(rng)
+        trump = random_suit(rng)
+        decks.extend(map(_indices[trump].__getitem__, deck))
+        trumps.append(SUITS.index(trump))
+    return decks, trumps
+
+
+def play_batch(decks, policy1, policy2):
+    """Play all the dealt games, return the list of results"""
+    results = []
+    for i in range(0, len(decks), NUM_CARDS):
+        deck = [CARDS[j] for j in decks[i:i + NUM_CARDS]]
+        results.append(play(deck, policy1, policy2))
+    return results
+
+
+def run(n, policy1, policy2, seed=None, first=0):
+    """Deal and play n games, return Counter of results"""
+    decks, trumps = deal(n, seed, first)
+    return Counter(play_batch(decks, policy1, policy2))
@@ -0,0 +1,310 @@
+"""Benchmarks.  Run as: python bench.py <benchmark> [options]"""
+
+import random
+import time
+import timeit
+from argparse import ArgumentParser
+from statistics import mean
+
+import alphabeta
+import batch
+import common
+import decision_tree
+import dumb
+import endgame
+import smart
+import smartest
+from cardset import CARDS, FULL, TRUMPS, MATCHING, MIN_VALUE, NUM_VALUES, face_value_of,\
+    iterate, make_card, slot_of, matching, size, split, strongest
+from game import rungame
+from gamelog import RESULTS
+from transposition import TranspositionTable
+
+try:
+    import numpy as np
+    import lockstep
+except ImportError:
+    lockstep = None
+
+
+def selfplay(N, seed):
+    random.seed(seed)
+    for i in range(N):
+        rungame(smartest.scenario, smartest.scenario)
+
+
+def bench_canonical(args):
+    """Distinct decision tree nodes searched in smartest self-play"""
+    for canonical_positions in (False, True):
+        decision_tree.canonical_positions = canonical_positions
+        table = decision_tree.shared_table = TranspositionTable(capacity=10 ** 9)
+        start = time.perf_counter()
+        selfplay(args.N, args.seed)
+        elapsed = time.perf_counter() - start
+        print("canonical={}: {} distinct nodes, {} lookups, {:.2f}s".format(
+            canonical_positions, table.misses, table.hits + table.misses, elapsed
+        ))
+
+    decision_tree.shared_table = None
+
+
+def bench_alphabeta(args):
+    """Decision tree nodes searched in smartest self-play, without and with cutoffs"""
+    max_levels, make_decision = smartest.MAX_LEVELS, smartest.make_decision
+    try:
+        for levels in args.levels:
+            smartest.MAX_LEVELS = levels
+            for engine in (decision_tree, alphabeta):
+                smartest.make_decision = engine.make_decision
+                table = decision_tree.shared_table = TranspositionTable(capacity=10 ** 9)
+                start = time.perf_counter()
+                selfplay(args.N, args.seed)
+                elapsed = time.perf_counter() - start
+                print("levels={} {}: {} nodes, {:.2f}s".format(
+                    levels, engine.__name__, table.misses, elapsed
+                ))
+    finally:
+        smartest.MAX_LEVELS, smartest.make_decision = max_levels, make_decision
+        decision_tree.shared_table = None
+
+
+def bench_batch(args):
+    """Games per second of `rungame' and of the batch engine, on the same deals"""
+    scenarios = {'dumb': dumb.scenario, 'smart': smart.scenario}
+    for name1, name2 in [('dumb', 'dumb'), ('dumb', 'smart'), ('smart', 'dumb'),
+                         ('smart', 'smart')]:
+        random.seed(args.seed)
+        start = time.perf_counter()
+        expected = [rungame(scenarios[name1], scenarios[name2]) for i in range(args.N)]
+        elapsed1 = time.perf_counter() - start
+
+        random.seed(args.seed)
+        start = time.perf_counter()
+        decks, trumps = batch.deal(args.N)
+        results = batch.play_batch(decks, batch.POLICIES[name1], batch.POLICIES[name2])
+        elapsed2 = time.perf_counter() - start
+
+        assert results == expected, "Batch engine results differ"
+        print("{} vs {}: rungame {:.0f} games/s, batch {:.0f} games/s ({:.1f}x)".format(
+            name1, name2, args.N / elapsed1, args.N / elapsed2, elapsed1 / elapsed2
+        ))
+        if lockstep is None:
+            continue
+
+        random.seed(args.seed)
+        start = time.perf_counter()
+        decks = np.frombuffer(batch.deal(args.N)[0], np.uint8).reshape(args.N, -1)
+        middle = time.perf_counter()
+        codes = lockstep.play(decks, lockstep.POLICIES[name1], lockstep.POLICIES[name2])
+        elapsed3 = time.perf_counter() - start
+        elapsed4 = time.perf_counter() - middle
+
+        assert [RESULTS[code] for code in codes] == expected, \
+            "Lockstep engine results differ"
+        print("{} vs {}: lockstep {:.0f} games/s ({:.1f}x), not counting the deal "
+              "{:.0f} games/s ({:.1f}x)".format(
+                  name1, name2, args.N / elapsed3, elapsed1 / elapsed3,
+                  args.N / elapsed4, elapsed1 / elapsed4
+              ))
+
+
+def bench_common(args):
+    """Card functions of `common': computed on every call vs per-trump tables"""
+    rnd = random.Random(args.seed)
+    trump = 'hearts'
+    context = common.game_context(trump)
+    deck = sorted(common.deckset)
+    pairs = [(rnd.choice(deck), rnd.choice(deck)) for i in range(1000)]
+    hands = [rnd.sample(deck, 6) for i in range(1000)]
+    values = [frozenset(rnd.sample(range(6, 15), 3)) for i in range(1000)]
+
+    def computed_value(card):
+        return common._card_value(card, trump)
+
+    def computed_matching(cards, cardvalues):
+        return frozenset(filter(lambda c: c.value in cardvalues, cards))
+
+    cases = [
+        ('beats',
+         lambda: [common._beats(c1, c2, trump) for c1, c2 in pairs],
+         lambda: [context.beats(c1, c2) for c1, c2 in pairs]),
+        ('card_value',
+         lambda: [computed_value(c1) for c1, c2 in pairs],
+         lambda: [context.card_value(c1) for c1, c2 in pairs]),
+        ('values_of',
+         lambda: [frozenset(map(computed_value, hand)) for hand in hands],
+         lambda: [context.values_of(hand) for hand in hands]),
+        ('unbeatables',
+         lambda: [
+             sorted(computed_matching(hand, vals), key=computed_value)[:3]
+             for hand, vals in zip(hands, values)
+         ],
+         lambda: [context.unbeatables(hand, vals, 3) for hand, vals in zip(hands, values)]),
+        ('mean_cardvalue',
+         lambda: [mean(map(computed_value, hand)) for hand in hands],
+         lambda: [context.mean_cardvalue(hand) for hand in hands]),
+    ]
+    for name, computed, tabled in cases:
+        t1 = min(timeit.repeat(computed, number=args.N // 10 or 1, repeat=5))
+        t2 = min(timeit.repeat(tabled, number=args.N // 10 or 1, repeat=5))
+        print("{}: computed {:.3f}s, tables {:.3f}s ({:.2f}x)".format(
+            name, t1, t2, t1 / t2
+        ))
+
+
+def bench_endgame(args):
+    """How often the decision tree picks an exactly best move in open positions"""
+    rnd = random.Random(args.seed)
+    positions = []
+    for i in range(args.N):
+        cards = rnd.sample(CARDS, args.cards)
+        n = rnd.randint(1, args.cards - 1)
+        positions.append((sum(cards[:n]), sum(cards[n:]), 0, 0))
+    start = time.perf_counter()
+    exact = [endgame.move_values('i_attack', position) for position in positions]
+    print("exact values: {:.2f}s".format(time.perf_counter() - start))
+
+    for levels in args.levels:
+        start = time.perf_counter()
+        best = lost = 0
+        for position, values in zip(positions, exact):
+            est, move = decision_tree.make_decision(levels, 'i_attack')(*position)
+            best += values[move] == max(values.values())
+            lost += max(values.values()) - values[move]
+        print("levels={}: best move in {:.1%} of positions, {:.3f} lost per move, "
+              "{:.2f}s".format(levels, best / args.N, lost / args.N,
+                               time.perf_counter() - start))
+
+
+def bench_leaf(args):
+    """Leaf evaluation (`decision_tree.cardset_relation') in smartest self-play"""
+    leaves = []
+    cardset_relation = decision_tree.cardset_relation
+
+    def recording(cards1, cards2):
+        leaves.append((cards1, cards2))
+        return cardset_relation(cards1, cards2)
+
+    decision_tree.cardset_relation = recording
+    try:
+        start = time.perf_counter()
+        selfplay(args.N, args.seed)
+        elapsed = time.perf_counter() - start
+    finally:
+        decision_tree.cardset_relation = cardset_relation
+    print("{} leaves evaluated in {:.2f}s of self-play".format(len(leaves), elapsed))
+
+    for fn in (decision_tree.sorted_cardset_relation, decision_tree.cardset_relation):
+        t = min(timeit.repeat(lambda: [fn(c1, c2) for c1, c2 in leaves], number=1, repeat=5))
+        print("{}: {:.3f}s, {:.2f}us per leaf".format(
+            fn.__name__, t, t / len(leaves) * 1e6 if leaves else 0
+        ))
+
+
+def unbeatables_positions(rnd, n, k):
+    """n positions where we have k cards matching the table that the rival can't beat"""
+    positions = []
+    while len(positions) < n:
+        table = rnd.sample(CARDS, 3)
+        t_off, t_def = table[0] | table[1], table[2]
+        allowed = matching(FULL, t_off | t_def) & ~(t_off | t_def)
+        if size(allowed) < k:
+            continue
+        mine = sum(rnd.sample(split(allowed), k))
+        rest = [c for c in CARDS if not c & (allowed | t_off | t_def)]
+        others = rnd.sample(rest, 8)
+        positions.append((mine | sum(others[:2]), sum(others[2:]), t_off, t_def))
+    return positions
+
+
+# Face value -> slot 0 card that matches the cards of that value (see `cardset.MATCHING')
+MATCHED_BY = {
+    face_value_of(c): make_card(0, v)
+    for v in range(MIN_VALUE, MIN_VALUE + NUM_VALUES)
+    for c in iterate(MATCHING[make_card(0, v)])
+}
+MATCHED_VALUES = sorted(MATCHED_BY)
+
+
+def paired_unbeatables_positions(rnd, n, k):
+    """Same as `unbeatables_positions', but our matching cards come in pairs of equal
+    value in 2 non-trump suits (slots 1 and 2) that nobody else holds, so the suits are
+    interchangeable.  The rival holds trumps and slot 0 cards only.
+    """
+    positions = []
+    while len(positions) < n:
+        pairs = rnd.sample(MATCHED_VALUES, (k + 1) // 2)
+        mine = sum(make_card(1, v) | make_card(2, v) for v in pairs)
+        mine &= ~strongest(mine) if k % 2 else FULL
+        # Table of slot 0 cards that match our values
+        t_off = sum(MATCHED_BY[v] for v in pairs[::2])
+        t_def = sum(MATCHED_BY[v] for v in pairs[1::2])
+        taken = mine | t_off | t_def | matching(FULL, t_off | t_def)
+        rest = [c for c in CARDS if not c & taken and (c & TRUMPS or slot_of(c) == 0)]
+        if size(matching(mine, t_off | t_def)) != k or len(rest) < 8:
+            continue
+        others = rnd.sample(rest, 8)
+        positions.append((mine | sum(others[:2]), sum(others[2:]), t_off, t_def))
+    return positions
+
+
+def bench_unbeatables(args):
+    """i_put_unbeatables with 4-6 matching cards: all the sets vs distinct ones"""
+    rnd = random.Random(args.seed)
+    for k, kind, make_positions in [
+        (k, kind, make_positions)
+        for kind, make_positions in [('random', unbeatables_positions),
+                                     ('paired', paired_unbeatables_positions)]
+        for k in (4, 5, 6)
+    ]:
+        positions = make_positions(rnd, args.N // 10 or 1, k)
+        for levels in args.levels:
+            times, results = [], []
+            for distinct in (False, True):
+                decision_tree.distinct_unbeatables = distinct
+                fn = alphabeta.make_decision(levels, 'i_put_unbeatables')
+                start = time.perf_counter()
+                results.append([fn(*position) for position in positions])
+                times.append(time.perf_counter() - start)
+            # Skipped sets are equivalent to earlier ones: the results are the same
+            assert results[0] == results[1]
+            print("{} {} cards, levels={}: {:.3f}s all sets, {:.3f}s distinct "
+                  "({:.2f}x)".format(kind, k, levels, times[0], times[1], times[0] / times[1]))
+
+        n_all = n_distinct = 0
+        for position in positions:
+            decision_tree.distinct_unbeatables = False
+            n_all += len(list(decision_tree.unbeatables_variants(*position)))
+            decision_tree.distinct_unbeatables = True
+            n_distinct += len(list(decision_tree.unbeatables_variants(*position)))
+        print("{} {} cards: {} sets, {} distinct".format(kind, k, n_all, n_distinct))
+
+    decision_tree.distinct_unbeatables = True
+
+
+BENCHMARKS = {
+    'canonical': bench_canonical,
+    'alphabeta': bench_alphabeta,
+    'batch': bench_batch,
+    'common': bench_common,
+    'endgame': bench_endgame,
+    'leaf': bench_leaf,
+    'unbeatables': bench_unbeatables,
+}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('-N', type=int, default=1000, help="number of games")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--levels', type=int, nargs='+', default=[2, 3],
+                        help="decision tree depths")
+    parser.add_argument('--cards', type=int, default=8,
+                        help="number of cards in positions of the endgame benchmark")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Canonical forms of decision tree positions.
+
+A position is a tuple of card sets (see `cardset').  Two transformations keep the
+outcome of a position:
+
+    * permuting non-trump suits: `beats' and card values do not distinguish them;
+    * squeezing out values that nobody holds: only the order of card values matters.
+
+Values are not squeezed across the ones that take part in `cardset.MATCHING', because
+for them the absolute value matters.  The canonical form is the squeezed position with
+non-trump suits sorted by their contents.
+
+For speed, the canonical form is a single int: the card sets of the position packed
+one after another, the first one in the most significant bits.
+
+The rival's policy in the decision tree breaks ties between equal non-trump cards by
+the contents of their suits, not by suit order (see `decision_tree.rival_weakest'), so
+a position and its canonical form get the same estimates.
+"""
+
+from functools import reduce
+from operator import or_
+
+from cardset import CARDS, MATCHING, MATCHING_SOURCES, NUM_CARDS, NUM_SLOTS, NUM_VALUES,\
+    FULL, TRUMPS, FIRST_TRUMP_BIT, make_card
+
+
+SLOT0 = reduce(or_, CARDS[0:FIRST_TRUMP_BIT:NUM_SLOTS])
+
+_MATCHING_TARGETS = reduce(or_, MATCHING.values())
+
+
+def _segments(rank_masks, shift):
+    """Maximal runs of ranks that may be squeezed, as (rank masks, shift per rank)"""
+    segments, run = [], []
+    for mask in rank_masks + [None]:
+        if mask is None or mask & (MATCHING_SOURCES | _MATCHING_TARGETS):
+            if len(run) > 1:
+                segments.append((tuple(run), shift))
+            run = []
+        else:
+            run.append(mask)
+    return segments
+
+
+SEGMENTS = _segments(
+    [make_card(0, v) * 0b111 for v in range(6, 6 + NUM_VALUES)], NUM_SLOTS
+) + _segments(
+    [make_card(None, v) for v in range(6, 6 + NUM_VALUES)], 1
+)
+SQUEEZABLE = reduce(or_, (mask for ranks, shift in SEGMENTS for mask in ranks))
+
+
+def replicate(mask, n):
+    """Mask repeated for each of n packed card sets"""
+    return sum(mask << NUM_CARDS * i for i in range(n))
+
+
+def pack(position):
+    packed = 0
+    for x in position:
+        packed = packed << NUM_CARDS | x
+    return packed
+
+
+def unpack(packed, n):
+    return tuple(
+        packed >> NUM_CARDS * i & FULL for i in range(n - 1, -1, -1)
+    )
+
+
+class _PackedMasks:
+    """Masks for positions of n card sets"""
+    __slots__ = 'n', 'slot0', 'trumps', 'squeezes'
+
+    def __init__(self, n):
+        self.n = n
+        self.slot0 = replicate(SLOT0, n)
+        self.trumps = replicate(TRUMPS, n)
+        self.squeezes = {}  # held & SQUEEZABLE -> squeeze moves
+
+    def squeeze_moves(self, held):
+        """List of (mask, shift): move cards in mask down by shift, one after another"""
+        moves = []
+        for ranks, shift in SEGMENTS:
+            target = 0
+            for i, mask in enumerate(ranks):
+                if held & mask:
+                    if target < i:
+                        moves.append((replicate(mask, self.n), (i - target) * shift))
+                    target += 1
+        return moves
+
+
+_packed_masks = {}
+
+
+def canonical(position):
+    """Return (canonical form, transform)
+
+    Moves found in the canonical position (see `unpack') are mapped back with `restore'.
+    """
+    n = len(position)
+    packed = held = 0
+    for x in position:
+        packed = packed << NUM_CARDS | x
+        held |= x
+
+    masks = _packed_masks.get(n)
+    if masks is None:
+        masks = _packed_masks[n] = _PackedMasks(n)
+
+    key = held & SQUEEZABLE
+    moves = masks.squeezes.get(key)
+    if moves is None:
+        moves = masks.squeezes[key] = masks.squeeze_moves(held)
+    for mask, shift in moves:
+        packed = (packed & ~mask) | ((packed & mask) >> shift)
+
+    # The signature of a suit is its cards in every card set of the position
+    slot0 = masks.slot0
+    sig0 = packed & slot0
+    sig1 = packed >> 1 & slot0
+    sig2 = packed >> 2 & slot0
+    # Suits are sorted by (signature, suit)
+    if sig0 <= sig1:
+        if sig1 <= sig2:
+            return packed, (moves, (0, 1, 2))
+        elif sig0 <= sig2:
+            order = (0, 2, 1)
+            packed = (packed & masks.trumps) | sig0 | sig2 << 1 | sig1 << 2
+        else:
+            order = (2, 0, 1)
+            packed = (packed & masks.trumps) | sig2 | sig0 << 1 | sig1 << 2
+    elif sig0 <= sig2:
+        order = (1, 0, 2)
+        packed = (packed & masks.trumps) | sig1 | sig0 << 1 | sig2 << 2
+    elif sig1 <= sig2:
+        order = (1, 2, 0)
+        packed = (packed & masks.trumps) | sig1 | sig2 << 1 | sig0 << 2
+    else:
+        order = (2, 1, 0)
+        packed = (packed & masks.trumps) | sig2 | sig1 << 1 | sig0 << 2
+
+    return packed, (moves, order)
+
+
+def restore(transform, cards):
+    """Map a card set of the canonical position back to the original one"""
+    if not cards:
+        return cards
+
+    moves, (s0, s1, s2) = transform
+    cards = (cards & TRUMPS) |\
+        (cards & SLOT0) << s0 | ((cards >> 1) & SLOT0) << s1 | ((cards >> 2) & SLOT0) << s2
+    for mask, shift in reversed(moves):
+        target = mask >> shift & FULL
+        cards = (cards & ~target) | ((cards & target) << shift)
+
+    return cards
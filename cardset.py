@@ -0,0 +1,191 @@
+"""Compact card sets: a set of cards is a 36-bit integer.
+
+The bit layout is relative to the trump suit of the game, so that the bit order is
+exactly the order of card strength (see `common.card_value'):
+
+    * bits 0..26 are non-trump cards, 3 per value: bit = 3 * (value - 6) + slot,
+      where slot (0, 1, 2) numbers the non-trump suits;
+    * bits 27..35 are trumps: bit = 27 + (value - 6).
+
+A single card is a set of one card, i.e. a power of 2.  The bit index of a card
+equals the number of cards it can beat (its card value), except for non-trumps
+where the slot must be dropped.  Because everything here is trump-relative, none
+of the tables below depends on the trump of the game: conversion from/to `Card'
+objects is done by `common.Encoding'.
+"""
+
+from functools import reduce
+from operator import or_
+
+
+NUM_SLOTS = 3  # number of non-trump suits
+NUM_VALUES = 9  # 6 .. 14
+MIN_VALUE = 6
+
+NUM_CARDS = NUM_VALUES * (NUM_SLOTS + 1)
+FIRST_TRUMP_BIT = NUM_VALUES * NUM_SLOTS
+
+EMPTY = 0
+FULL = (1 << NUM_CARDS) - 1
+TRUMPS = FULL & ~((1 << FIRST_TRUMP_BIT) - 1)
+NONTRUMPS = FULL & ~TRUMPS
+
+CARDS = tuple(1 << i for i in range(NUM_CARDS))
+
+
+def make_card(slot, value):
+    """Card of given face value; slot is 0..2 for non-trumps, None for a trump"""
+    if slot is None:
+        return 1 << (FIRST_TRUMP_BIT + value - MIN_VALUE)
+    else:
+        return 1 << (NUM_SLOTS * (value - MIN_VALUE) + slot)
+
+
+def index_of(card):
+    return card.bit_length() - 1
+
+
+def slot_of(card):
+    """Non-trump suit slot of the card, or None for a trump"""
+    i = index_of(card)
+    return i % NUM_SLOTS if i < FIRST_TRUMP_BIT else None
+
+
+def face_value_of(card):
+    i = index_of(card)
+    if i < FIRST_TRUMP_BIT:
+        return MIN_VALUE + i // NUM_SLOTS
+    else:
+        return MIN_VALUE + i - FIRST_TRUMP_BIT
+
+
+def _card_value(i):
+    return i - i % NUM_SLOTS if i < FIRST_TRUMP_BIT else i
+
+
+# card -> how many cards it can beat
+VALUE = {card: _card_value(i) for i, card in enumerate(CARDS)}
+
+# card -> set of cards that beat it
+BEATEN_BY = {
+    card: (
+        reduce(or_, CARDS[i + NUM_SLOTS:FIRST_TRUMP_BIT:NUM_SLOTS], 0) | TRUMPS
+        if i < FIRST_TRUMP_BIT else
+        TRUMPS & ~((card << 1) - 1)
+    )
+    for i, card in enumerate(CARDS)
+}
+
+# card on the table -> set of cards that can be put after it.  This mirrors
+# `common.matching_by_value': the card values of the table are compared to the
+# face values of the cards.
+MATCHING = {
+    card: reduce(or_, (c for c in CARDS if face_value_of(c) == VALUE[card]), 0)
+    for card in CARDS
+}
+MATCHING_SOURCES = reduce(or_, (c for c in CARDS if MATCHING[c]), 0)
+
+# card -> set of cards of the same card value (including itself)
+SAME_VALUE = {
+    card: reduce(or_, (c for c in CARDS if VALUE[c] == VALUE[card]), 0) for card in CARDS
+}
+
+# card -> set of cards of greater card value
+STRONGER = {card: FULL & ~((1 << SAME_VALUE[card].bit_length()) - 1) for card in CARDS}
+
+
+# Sums of card values for every 9-bit chunk of a card set
+_CHUNK = 9
+_CHUNK_MASK = (1 << _CHUNK) - 1
+_VALUE_SUMS = tuple(
+    tuple(
+        sum(_card_value(k * _CHUNK + j) for j in range(_CHUNK) if m >> j & 1)
+        for m in range(1 << _CHUNK)
+    )
+    for k in range(NUM_CARDS // _CHUNK)
+)
+
+
+try:
+    size = int.bit_count
+except AttributeError:
+    def size(cards):
+        return bin(cards).count('1')
+
+
+def weakest(cards):
+    """The weakest card of a non-empty set"""
+    return cards & -cards
+
+
+def strongest(cards):
+    return 1 << (cards.bit_length() - 1)
+
+
+def iterate(cards):
+    """Iterate over cards from the weakest to the strongest"""
+    while cards:
+        card = cards & -cards
+        yield card
+        cards ^= card
+
+
+def split(cards):
+    """List of cards, from the weakest to the strongest"""
+    return list(iterate(cards))
+
+
+def weakest_n(cards, n):
+    """Set of at most n weakest cards"""
+    res = 0
+    while cards and n > 0:
+        card = cards & -cards
+        res |= card
+        cards ^= card
+        n -= 1
+    return res
+
+
+def union(cards):
+    """Union of an iterable of disjoint cards/card sets"""
+    return sum(cards)
+
+
+def beats(card1, card2):
+    return bool(card1 & BEATEN_BY[card2])
+
+
+def beaters(cards, card):
+    """Subset of cards that beat given card"""
+    return cards & BEATEN_BY[card]
+
+
+def matching(cards, table, exclude_trumps=False):
+    """Subset of cards that can be put when the table is as given"""
+    allowed = 0
+    sources = table & MATCHING_SOURCES
+    while sources:
+        card = sources & -sources
+        allowed |= MATCHING[card]
+        sources ^= card
+    if exclude_trumps:
+        allowed &= NONTRUMPS
+    return cards & allowed
+
+
+def unbeatables(cards, table, maxn):
+    """Set of suitable unbeatables: the weakest matching ones"""
+    return weakest_n(matching(cards, table), maxn)
+
+
+def total_value(cards):
+    return (
+        _VALUE_SUMS[0][cards & _CHUNK_MASK] +
+        _VALUE_SUMS[1][cards >> _CHUNK & _CHUNK_MASK] +
+        _VALUE_SUMS[2][cards >> 2 * _CHUNK & _CHUNK_MASK] +
+        _VALUE_SUMS[3][cards >> 3 * _CHUNK]
+    )
+
+
+def mean_value(cards):
+    return total_value(cards) / size(cards)
@@ -1,8 +1,9 @@
-from statistics import mean
+from statistics import StatisticsError
 from collections import Counter, namedtuple
 from operator import attrgetter
-from random import choice, shuffle
+import random
 
+import cardset
 import gcxt
 
 
@@ -27,11 +28,7 @@ assert len(deckset) == 36
 NUM_CARDS_PER_SUIT = len(deckset) // len(SUITS)
 
 
-def beats(c1, c2, trump=None):
-    if trump is None:
-        trump = gcxt.trump
-    assert trump is not None
-
+def _beats(c1, c2, trump):
     s1, v1 = c1
     s2, v2 = c2
     if s1 == s2:
@@ -40,12 +37,7 @@ def beats(c1, c2, trump=None):
         return s1 == trump
 
 
-def card_value(card, trump=None):
-    """How many cards can this one beat"""
-    if trump is None:
-        trump = gcxt.trump
-    assert trump is not None
-
+def _card_value(card, trump):
     s, v = card
     if s != trump:
         return (v - MIN_CARD_VALUE) * (len(SUITS) - 1)
@@ -53,11 +45,20 @@ def card_value(card, trump=None):
         return NUM_CARDS_PER_SUIT * (len(SUITS) - 1) + (v - MIN_CARD_VALUE)
 
 
-def values_of(cards):
-    return frozenset(map(card_value, cards))
+def beats(c1, c2, trump=None):
+    return game_context(trump).beats(c1, c2)
+
+
+def card_value(card, trump=None):
+    """How many cards can this one beat"""
+    return game_context(trump).card_value(card)
+
 
+def values_of(cards, trump=None):
+    return game_context(trump).values_of(cards)
 
-def matching_by_value(cards, cardvalues, exclude_trumps=False):
+
+def matching_by_value(cards, cardvalues, exclude_trumps=False, trump=None):
     """Filter cards: take only those whose values are in cardvalues
 
     :param cards: iterable of cards
@@ -65,25 +66,130 @@ def matching_by_value(cards, cardvalues, exclude_trumps=False):
     :param consider_trumps: if False, exclude trumps from result
     :return: frozenset of cards
     """
-    def cond(c):
-        return (not exclude_trumps or c.suit != gcxt.trump) and c.value in cardvalues
-
-    return frozenset(filter(cond, cards))
+    return game_context(trump).matching_by_value(cards, cardvalues, exclude_trumps)
 
 
-def unbeatables(cards, cardvalues, maxn):
+def unbeatables(cards, cardvalues, maxn, trump=None):
     """Return frozenset of suitable unbeatables"""
-    suitable = sorted(matching_by_value(cards, cardvalues), key=card_value)
-    del suitable[min(maxn, len(suitable)):]
-    return frozenset(suitable)
+    return game_context(trump).unbeatables(cards, cardvalues, maxn)
+
+
+def mean_cardvalue(cards, trump=None):
+    return game_context(trump).mean_cardvalue(cards)
+
 
+class Encoding:
+    """Conversion between `Card' objects and trump-relative card sets (see `cardset')"""
+    __slots__ = 'trump', 'bit_of', 'card_of'
 
-def mean_cardvalue(cards):
-    return mean(map(card_value, cards))
+    def __init__(self, trump):
+        self.trump = trump
+        self.bit_of = {}
+        nontrumps = [suit for suit in SUITS if suit != trump]
+        for v in range(MIN_CARD_VALUE, MAX_CARD_VALUE + 1):
+            self.bit_of[Card(trump, v)] = cardset.make_card(None, v)
+            for slot, suit in enumerate(nontrumps):
+                self.bit_of[Card(suit, v)] = cardset.make_card(slot, v)
+        self.card_of = {bit: card for card, bit in self.bit_of.items()}
 
+    def card(self, card):
+        return self.bit_of[card]
 
-def random_suit():
-    return choice(SUITS)
+    def cards(self, cards):
+        return cardset.union(self.bit_of[c] for c in cards)
+
+    def to_card(self, bit):
+        return self.card_of[bit]
+
+    def to_cards(self, cards):
+        return frozenset(map(self.card_of.__getitem__, cardset.iterate(cards)))
+
+    def native(self, value):
+        """Convert a card or a set of cards to the card set form, pass anything else"""
+        if isinstance(value, Card):
+            return self.bit_of[value]
+        elif isinstance(value, (set, frozenset)):
+            return self.cards(value)
+        else:
+            return value
+
+
+class GameContext:
+    """Everything that depends on the trump of a game
+
+    Games get their context explicitly, so any number of them can run in one process.
+    The functions of this module that take an optional trump use the context of
+    `gcxt.trump' by default.
+
+    Card functions are table lookups:
+        value: {card: card value}
+        index: {card: index}, in the order of strength (the one of `cardset')
+        beaten_by: {card: frozenset of cards that beat it}
+    """
+    __slots__ = 'trump', 'encoding', 'value', 'index', 'beaten_by'
+
+    def __init__(self, trump):
+        self.trump = trump
+        self.encoding = Encoding(trump)
+        self.value = {card: _card_value(card, trump) for card in deckset}
+        self.index = {
+            card: cardset.index_of(bit) for card, bit in self.encoding.bit_of.items()
+        }
+        self.beaten_by = {
+            c2: frozenset(c1 for c1 in deckset if _beats(c1, c2, trump))
+            for c2 in deckset
+        }
+
+    def beats(self, c1, c2):
+        return c1 in self.beaten_by[c2]
+
+    def card_value(self, card):
+        """How many cards can this one beat"""
+        return self.value[card]
+
+    def values_of(self, cards):
+        return frozenset(map(self.value.__getitem__, cards))
+
+    def matching_by_value(self, cards, cardvalues, exclude_trumps=False):
+        """See `matching_by_value'"""
+        if exclude_trumps:
+            trump = self.trump
+            return frozenset(c for c in cards if c[1] in cardvalues and c[0] != trump)
+        else:
+            return frozenset(c for c in cards if c[1] in cardvalues)
+
+    def unbeatables(self, cards, cardvalues, maxn):
+        """Return frozenset of suitable unbeatables"""
+        suitable = sorted(
+            frozenset(c for c in cards if c[1] in cardvalues), key=self.value.__getitem__
+        )
+        del suitable[min(maxn, len(suitable)):]
+        return frozenset(suitable)
+
+    def mean_cardvalue(self, cards):
+        values = list(map(self.value.__getitem__, cards))
+        if not values:
+            raise StatisticsError("mean requires at least one data point")
+        return sum(values) / len(values)
+
+
+_contexts = {suit: GameContext(suit) for suit in SUITS}
+
+
+def game_context(trump=None):
+    """Context of games with trump, `gcxt.trump' by default"""
+    if trump is None:
+        trump = gcxt.trump
+    assert trump is not None
+    return _contexts[trump]
+
+
+def encoding(trump=None):
+    return game_context(trump).encoding
+
+
+def random_suit(rng=random):
+    return rng.choice(SUITS)
 
 
 NCARDS_PLAYER = 6
@@ -91,16 +197,29 @@ NCARDS_PLAYER = 6
 NCARDS_DECK_BEGINNING = len(deckset) - 2 * NCARDS_PLAYER
 
 
-def random_deck():
+# Iteration order of deckset depends on hashing, so shuffle this instead
+_sorted_deck = tuple(sorted(deckset))
+
+
+def random_deck(rng=random):
     """Return a deck in random order.
 
+    :param rng: random.Random instance or the random module itself
     :return: list of cards, full deck
     """
-    deck = list(deckset)
-    shuffle(deck)
+    deck = list(_sorted_deck)
+    rng.shuffle(deck)
     return deck
 
 
+def game_random(seed, index):
+    """Random generator of game number `index' in a run with master `seed'
+
+    The same (seed, index) always gives the same deal, in any process.
+    """
+    return random.Random('{}:{}'.format(seed, index))
+
+
 def factorial(nom, denom):
     res = Counter()
     for n in nom:
@@ -143,16 +262,20 @@ class RequestCode(metaclass=CodesMetaclass):
     )
 
 
-# Wrapper for player algorithms
+# Wrapper for player algorithms.  Player algorithms work with card sets (see `cardset'),
+# cards and sets of `Card' objects that are sent to them are converted.
 class Player:
-    __slots__ = 'value', 'request_code', 'gen'
+    __slots__ = 'value', 'request_code', 'gen', 'encoding'
 
-    def __init__(self, genfunc, mycards, iattack):
+    def __init__(self, genfunc, mycards, iattack, context=None):
         def value_sender(val):
             self.value = val
 
+        if context is None:
+            context = game_context()
+        self.encoding = context.encoding
         self.value = self.request_code = novalue
-        self.gen = genfunc(value_sender, mycards, iattack)
+        self.gen = genfunc(value_sender, self.encoding.native(mycards), iattack)
         self.send(None)
 
     def send(self, value, request_code_must_be=None):
@@ -162,4 +285,4 @@ class Player:
         # Previously generated value is reset.  The generator will assign a new value
         # in the course of its work.
         self.value = novalue
-        self.request_code = self.gen.send(value)
+        self.request_code = self.gen.send(self.encoding.native(value))
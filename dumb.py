@@ -7,93 +7,86 @@ The dumb player's strategy is like this:
     * put or not to put trump cards (varies).
 """
 
-from common import card_value, beats, matching_by_value, RequestCode as rc, values_of
+from cardset import weakest, beaters, matching, unbeatables, size
+from common import RequestCode as rc
 
 
 def scenario(send, cards, iattack):
     # Remember: we are not responsible to track EOG conditions here. This
     # is for the code that manages the game to handle.
-    cards = set(cards)
-    nrival_cards = len(cards)
+    nrival_cards = size(cards)
 
     def choose_from(these):
-        these = frozenset(these)
+        nonlocal cards
+
         if not these:
             return None
 
-        card = min(these, key=card_value)
-        cards.remove(card)
+        card = weakest(these)
+        cards ^= card
         return card
 
     def offense():
         """Return True if it we offense after that (== the rival did not survive)"""
-        nonlocal nrival_cards
+        nonlocal nrival_cards, cards
 
-        toff, tdef = set(), set()
+        toff, tdef = 0, 0
         while nrival_cards > 0 and cards:
             if toff:
-                offcard = choose_from(
-                    matching_by_value(cards, values_of(toff | tdef))
-                )
+                offcard = choose_from(matching(cards, toff | tdef))
             else:
                 offcard = choose_from(cards)
             send(offcard)
             if offcard is None:
                 break
 
-            toff.add(offcard)
+            toff |= offcard
 
             defcard = yield rc.DEFCARD
             if defcard is not None:
-                tdef.add(defcard)
+                tdef |= defcard
                 nrival_cards -= 1
             else:
-                unbeatables = choose_unbeatables(nrival_cards - 1, values_of(toff | tdef))
-                cards.difference_update(unbeatables)
-                nrival_cards += len(unbeatables) + len(toff) + len(tdef)
-                send(unbeatables)
+                unb = unbeatables(cards, toff | tdef, nrival_cards - 1)
+                cards &= ~unb
+                nrival_cards += size(unb) + size(toff) + size(tdef)
+                send(unb)
                 return True
 
         return False
 
-    def choose_unbeatables(n, cardvalues):
-        unbeatables = sorted(matching_by_value(cards, cardvalues), key=card_value)
-        del unbeatables[min(n, len(unbeatables)):]
-        return frozenset(unbeatables)
-
     def defense():
         """Return True if it we offense after that (== we survived this strike)"""
-        nonlocal nrival_cards
+        nonlocal nrival_cards, cards
 
-        toff, tdef = set(), set()
+        toff, tdef = 0, 0
         while nrival_cards > 0 and cards:
             offcard = yield rc.OFFCARD
             if offcard is None:
                 break
 
             nrival_cards -= 1
-            toff.add(offcard)
+            toff |= offcard
 
             assert cards, "Logic error"
-            suitable = frozenset(c for c in cards if beats(c, offcard))
-            defcard = choose_from(suitable)
+            defcard = choose_from(beaters(cards, offcard))
             send(defcard)
             if defcard is None:
                 # i cannot beat the beatcard
-                unbeatables = yield rc.UNBEATABLES
-                assert len(unbeatables) < len(cards)
-                toff |= unbeatables
-                cards.update(toff, tdef)
-                nrival_cards -= len(unbeatables)
+                unb = yield rc.UNBEATABLES
+                assert size(unb) < size(cards)
+                toff |= unb
+                cards |= toff | tdef
+                nrival_cards -= size(unb)
                 break
 
-            tdef.add(defcard)
+            tdef |= defcard
 
-        return len(toff) == len(tdef)
+        return size(toff) == size(tdef)
 
     while cards and nrival_cards > 0:
         iattack = (yield from offense()) if iattack else (yield from defense())
-        cards.update((yield rc.REPLENISHMENT))
+        cards |= yield rc.REPLENISHMENT
         nrival_cards += yield rc.NUM_RIVAL_REPLENISHMENT
 
     yield rc.GAME_OVER
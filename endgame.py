@@ -0,0 +1,190 @@
+"""Exact solver of the open game.
+
+When the deck is empty, both hands are known and nothing is left to chance.  Unlike
+`decision_tree', here both players choose their moves, and the search goes to the end
+of the game, so the values are exact: 1.0 if the attacker wins, 0.5 for a draw, 0.0
+if the attacker loses (as `decision_tree.check_eog' has it for iattack=True).
+
+Solved positions are kept in `solved', keyed by canonical form (see `canonical'), across
+decisions and games: their values never change.  Positions at the start of a strike are
+looked up in `tablebase' first, if one is open.
+"""
+
+from itertools import combinations
+
+from alphabeta import Budget
+from canonical import canonical, unpack
+from cardset import beaters, matching, iterate, split, size
+from decision_tree import check_eog
+from transposition import TranspositionTable
+
+
+# Positions with more cards than that (on hands and on the table) are not solved.
+# The number of nodes grows about 10 times with every 2 cards: 8 cards take about 10^3
+# nodes, 12 cards about 10^5.
+MAX_CARDS = 10
+
+# Default node budget of a decision
+MAX_NODES = 5000
+
+solved = TranspositionTable(capacity=200000)
+
+# `tablebase.Tablebase' or None
+tablebase = None
+
+WIN, DRAW, LOSS = 1.0, 0.5, 0.0
+
+
+def solver_fns(budget=None):
+    """Dict of the solver functions: attack, defend and put_unbeatables
+
+    Each takes a position (c_off, c_def, t_off, t_def[, offcard]) as in `decision_tree'
+    and returns the value for the attacker.
+    """
+    spend = budget.spend if budget is not None else None
+
+    def memoized(fn):
+        name = fn.__name__
+
+        def wrapper(*position):
+            packed, transform = canonical(position)
+            key = (name, packed)
+            value = solved.get(key)
+            if value is None:
+                if spend is not None:
+                    spend()
+                value = fn(*unpack(packed, len(position)))
+                solved[key] = value
+            return value
+
+        return wrapper
+
+    @memoized
+    def attack(c_off, c_def, t_off, t_def):
+        res = check_eog(c_off, c_def, True)
+        if res is not None:
+            return res
+        if not t_off and tablebase is not None:
+            hit = tablebase.probe(c_off, c_def)
+            if hit is not None:
+                return hit[0]
+
+        best = None
+        for c in iterate(matching(c_off, t_off | t_def) if t_off else c_off):
+            value = defend(c_off ^ c, c_def, t_off | c, t_def, c)
+            if best is None or value > best:
+                best = value
+                if best == WIN:
+                    return best
+        if t_off:
+            value = WIN - attack(c_def, c_off, 0, 0)
+            if best is None or value > best:
+                best = value
+        return best
+
+    @memoized
+    def defend(c_off, c_def, t_off, t_def, offcard):
+        worst = put_unbeatables(c_off, c_def, t_off, t_def)
+        if worst == LOSS:
+            return worst
+        for c in iterate(beaters(c_def, offcard)):
+            value = attack(c_off, c_def ^ c, t_off, t_def | c)
+            if value < worst:
+                worst = value
+                if worst == LOSS:
+                    return worst
+        return worst
+
+    @memoized
+    def put_unbeatables(c_off, c_def, t_off, t_def):
+        suitable = split(matching(c_off, t_off | t_def))
+        best = None
+        for n in range(min(len(suitable), size(c_def) - 1) + 1):
+            for unb in map(sum, combinations(suitable, n)):
+                value = attack(c_off & ~unb, c_def | t_off | t_def | unb, 0, 0)
+                if best is None or value > best:
+                    best = value
+                    if best == WIN:
+                        return best
+        return best
+
+    return {
+        'attack': attack,
+        'defend': defend,
+        'put_unbeatables': put_unbeatables,
+    }
+
+
+def can_solve(position, max_cards=MAX_CARDS):
+    c_off, c_def, t_off, t_def = position[:4]
+    return size(c_off | c_def | t_off | t_def) <= max_cards
+
+
+def variants(fn, position, budget=None):
+    """List of (move, thunk) for the root of a decision; thunk() is the value of move
+
+    See `decision' for the arguments.
+    """
+    fns = solver_fns(budget)
+    attack, defend, put_unbeatables = fns['attack'], fns['defend'], fns['put_unbeatables']
+
+    if fn == 'i_attack':
+        c_off, c_def, t_off, t_def = position
+        result = [
+            (c, lambda c=c: defend(c_off ^ c, c_def, t_off | c, t_def, c))
+            for c in iterate(matching(c_off, t_off | t_def) if t_off else c_off)
+        ]
+        if t_off:
+            result.append((None, lambda: WIN - attack(c_def, c_off, 0, 0)))
+    elif fn == 'i_put_unbeatables':
+        c_off, c_def, t_off, t_def = position
+        suitable = split(matching(c_off, t_off | t_def))
+        result = [
+            (unb, lambda unb=unb: attack(c_off & ~unb, c_def | t_off | t_def | unb, 0, 0))
+            for n in range(min(len(suitable), size(c_def) - 1) + 1)
+            for unb in map(sum, combinations(suitable, n))
+        ]
+    elif fn == 'i_defend':
+        c_off, c_def, t_off, t_def, offcard = position
+        result = [
+            (c, lambda c=c: WIN - attack(c_off, c_def ^ c, t_off, t_def | c))
+            for c in iterate(beaters(c_def, offcard))
+        ]
+        result.append((None, lambda: WIN - put_unbeatables(c_off, c_def, t_off, t_def)))
+    else:
+        raise ValueError("Not a decision: {}".format(fn))
+
+    return result
+
+
+def decision(fn, position, budget=None):
+    """Exact counterpart of `decision_tree.make_decision(levels, fn)(*position)'
+
+    :param fn: 'i_attack', 'i_put_unbeatables' or 'i_defend'
+    :param budget: `alphabeta.Budget', MAX_NODES nodes by default.  BudgetExhausted is
+    raised when it is exhausted.
+    :return: (value, bestmove), value is ours.  Of equally good moves, the weakest one
+    is chosen.
+    """
+    if fn == 'i_attack' and not position[2] and tablebase is not None:
+        hit = tablebase.probe(position[0], position[1])
+        if hit is not None:
+            return hit
+
+    if budget is None:
+        budget = Budget(nodes=MAX_NODES)
+    budget.start()
+
+    best = None
+    for move, value in variants(fn, position, budget):
+        value = value()
+        if best is None or value > best[0]:
+            best = value, move
+            if value == WIN:
+                break
+    return best
+
+
+def move_values(fn, position):
+    """{move: exact value} for all the moves of a decision, without a budget"""
+    return {move: value() for move, value in variants(fn, position)}
@@ -0,0 +1,259 @@
+"""Equity of opening hands.
+
+The equity of a hand is the expected score (win 1, draw 1/2) of the player it is dealt
+to, in self-play of a scenario, separately for the player who attacks first (seat 0)
+and the other one (seat 1).  Card sets are trump-relative (see `cardset') and non-trump
+suits are interchangeable, so a hand is counted under its canonical form: non-trump
+suits sorted by their contents (see `canonical_hand').
+
+Every canonical hand has its slot at its dense rank (see `rank'): 2 seats x (games,
+points) as uint32, points being 2 per win and 1 per draw.  There are 350772 canonical
+hands, so a table takes 5.6 MB.  At runtime the file is memory-mapped (see
+`EquityTable').
+
+Fill a table with (run again with another seed to add more games):
+
+    python equity.py FILE --scenario smart -N 1000000
+
+Expected score of the 1st player over the deals of a run, from the hands alone:
+
+    python equity.py FILE --luck 1000 --seed SEED
+"""
+
+import mmap
+import os
+import random
+import struct
+import time
+from argparse import ArgumentParser
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import comb
+
+import batch
+from canonical import SLOT0
+from cardset import NUM_SLOTS, NUM_VALUES, FIRST_TRUMP_BIT, TRUMPS, NONTRUMPS,\
+    index_of, iterate, size
+from common import NCARDS_PLAYER, game_random
+from game import new_game, play, start_players
+from main import schedule
+from tournament import get_scenario
+
+
+MAGIC = b'DURAKEQ2'
+HEADER = struct.Struct('<8s16sQ')  # magic, scenario, number of games
+MAX_NAME = 16  # bytes of the scenario name in HEADER
+SLOT = struct.Struct('<IIII')  # seat 0 games, points, seat 1 games, points
+
+
+def canonical_hand(cards):
+    """The hand with its non-trump suits sorted by their bits, in descending order"""
+    slots = sorted(((cards >> slot) & SLOT0 for slot in range(NUM_SLOTS)), reverse=True)
+    return (cards & TRUMPS) | slots[0] | slots[1] << 1 | slots[2] << 2
+
+
+def _nontrump_parts():
+    """Canonical non-trump parts of hands by their number of cards: lists of card sets"""
+    suits = [[] for n in range(NCARDS_PLAYER + 1)]  # suit cards (in slot 0) by size
+    for mask in range(1 << NUM_VALUES):
+        cards = sum(1 << v * NUM_SLOTS for v in range(NUM_VALUES) if mask >> v & 1)
+        if size(cards) <= NCARDS_PLAYER:
+            suits[size(cards)].append(cards)
+
+    parts = [[] for n in range(NCARDS_PLAYER + 1)]
+    for n0 in range(NCARDS_PLAYER + 1):
+        for n1 in range(NCARDS_PLAYER - n0 + 1):
+            for n2 in range(NCARDS_PLAYER - n0 - n1 + 1):
+                for s0 in suits[n0]:
+                    for s1 in suits[n1]:
+                        if s1 > s0:
+                            continue
+                        for s2 in suits[n2]:
+                            if s2 <= s1:
+                                parts[n0 + n1 + n2].append(s0 | s1 << 1 | s2 << 2)
+    return [sorted(cards) for cards in parts]
+
+
+# Non-trump part of a canonical hand -> its index among those of the same size
+_NONTRUMP_INDEX = {
+    cards: i
+    for cards_of_size in _nontrump_parts() for i, cards in enumerate(cards_of_size)
+}
+_NUM_NONTRUMP = [0] * (NCARDS_PLAYER + 1)
+for cards in _NONTRUMP_INDEX:
+    _NUM_NONTRUMP[size(cards)] += 1
+
+# _COMB[x][k] == comb(x, k), for colex ranks of trumps
+_COMB = [[comb(x, k) for k in range(NCARDS_PLAYER + 1)] for x in range(NUM_VALUES)]
+
+# Hands with t trumps take ranks _OFFSETS[t], ..., _OFFSETS[t + 1] - 1
+_OFFSETS = [0]
+for t in range(NCARDS_PLAYER + 1):
+    _OFFSETS.append(_OFFSETS[-1] + comb(NUM_VALUES, t) * _NUM_NONTRUMP[NCARDS_PLAYER - t])
+
+NUM_HANDS = _OFFSETS[-1]
+
+
+def rank(hand):
+    """Index of the slot of a canonical 6-card hand, 0 <= rank < NUM_HANDS
+
+    Hands are ordered by the number of trumps, then by the colex rank of the trumps,
+    then by the non-trump part.
+    """
+    trumps = hand & TRUMPS
+    t = size(trumps)
+    trump_rank = sum(_COMB[index_of(c) - FIRST_TRUMP_BIT][i + 1]
+                     for i, c in enumerate(iterate(trumps)))
+    return _OFFSETS[t] + trump_rank * _NUM_NONTRUMP[NCARDS_PLAYER - t] + \
+        _NONTRUMP_INDEX[hand & NONTRUMPS]
+
+
+def score_points(result, seat):
+    """Points of the player in seat for a `game.rungame' result"""
+    if result is None:
+        return 1
+    return 2 if result == (seat == 0) else 0
+
+
+class EquityTable:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, scenario, self.games = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError("Not an equity table: {}".format(path))
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.scenario = scenario.rstrip(b'\0').decode()
+        if len(self.data) != HEADER.size + NUM_HANDS * SLOT.size:
+            raise ValueError("Equity table is damaged: {}".format(path))
+
+    def close(self):
+        self.data.close()
+
+    def counts(self, hand, seat):
+        """Return (games, points) of the hand in the seat"""
+        offset = HEADER.size + rank(canonical_hand(hand)) * SLOT.size + seat * 8
+        return struct.unpack_from('<II', self.data, offset)
+
+    def equity(self, hand, seat):
+        """Expected score of the hand in the seat, None if it was never dealt"""
+        games, points = self.counts(hand, seat)
+        return points / (2 * games) if games else None
+
+
+def expected_score(table, state):
+    """Expected score of the 1st player of a `game.GameState', from the dealt hands
+
+    The mean of the equity of its hand and 1 - the equity of the rival's, 0.5 for hands
+    not in the table.
+    """
+    e0 = table.equity(state.deal[0], 0)
+    e1 = table.equity(state.deal[1], 1)
+    return ((0.5 if e0 is None else e0) + (0.5 if e1 is None else 1 - e1)) / 2
+
+
+def deal_luck(table, seed, first, N):
+    """Mean expected score of the 1st player over games first, ..., first + N - 1 of the
+    run with seed (see `main', `tournament')"""
+    return sum(
+        expected_score(table, new_game(game_random(seed, i)))
+        for i in range(first, first + N)
+    ) / N
+
+
+def play_deals(name, seed, first, N):
+    """Self-play games first, ..., first + N - 1, return (Counter of games, of points)
+
+    Both are keyed by rank * 2 + seat.
+    """
+    games, points = Counter(), Counter()
+    for i in range(first, first + N):
+        state = new_game(game_random(seed, i))
+        deal = state.deal
+        if name in batch.POLICIES:
+            result = batch.rollout(state, batch.POLICIES[name], batch.POLICIES[name])
+        else:
+            scenario = get_scenario(name)
+            result = play(state, start_players(state, scenario, scenario))
+        for seat in (0, 1):
+            key = rank(canonical_hand(deal[seat])) * 2 + seat
+            games[key] += 1
+            points[key] += score_points(result, seat)
+    return games, points
+
+
+def generate(path, name, N, seed, workers=None, progress=None):
+    """Play N games of the scenario against itself, add them to the table at path
+
+    The table is created if there is none.
+    """
+    if len(name.encode()) > MAX_NAME:
+        raise ValueError("Scenario name is longer than {} bytes: {}".format(MAX_NAME, name))
+    if workers is None:
+        workers = os.cpu_count()
+    if os.path.exists(path):
+        table = EquityTable(path)
+        if table.scenario != name:
+            raise ValueError("{} is of scenario {}".format(path, table.scenario))
+        total = table.games
+        counts = array('I')
+        counts.frombytes(table.data[HEADER.size:])
+        table.close()
+    else:
+        total = 0
+        counts = array('I', [0]) * (NUM_HANDS * SLOT.size // 4)
+
+    with ProcessPoolExecutor(workers) as exe:
+        futures = {
+            exe.submit(play_deals, name, seed, start, n): n
+            for start, n in schedule(0, N, workers)
+        }
+        for f in as_completed(futures):
+            games, points = f.result()
+            for key, n in games.items():
+                counts[key * 2] += n
+                counts[key * 2 + 1] += points[key]
+            total += futures[f]
+            if progress:
+                print(total, "games played")
+
+    tmppath = path + '.tmp'
+    with open(tmppath, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, name.encode(), total))
+        f.write(counts.tobytes())
+    os.replace(tmppath, path)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('path')
+    parser.add_argument('--scenario', default='smart',
+                        help="scenario of the self-play (see `tournament')")
+    parser.add_argument('-N', type=int, default=0, help="number of games to play")
+    parser.add_argument('--seed', type=int,
+                        help="master seed of the games; random and printed if not given")
+    parser.add_argument('--workers', type=int,
+                        help="number of worker processes, CPU count by default")
+    parser.add_argument('--luck', type=int, metavar='N',
+                        help="print the expected score of the 1st player over the first "
+                             "N deals of the run with seed")
+    args = parser.parse_args()
+    seed = args.seed
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    print("Seed", seed)
+
+    if args.N:
+        start = time.perf_counter()
+        generate(args.path, args.scenario, args.N, seed, args.workers, progress=True)
+        print("Played in {:.0f}s".format(time.perf_counter() - start))
+
+    if args.luck:
+        table = EquityTable(args.path)
+        print("Expected score of the 1st player: {:.2%}".format(
+            deal_luck(table, seed, 0, args.luck)
+        ))
+
+
+if __name__ == '__main__':
+    main()
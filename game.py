@@ -1,89 +1,198 @@
-import gcxt
-from common import beats, random_deck, random_suit, NCARDS_PLAYER, RequestCode as rc,\
-    Player
+import pickle
+import random
 
+from cardset import beats, size, union
+from common import random_deck, random_suit, NCARDS_PLAYER, RequestCode as rc, Player,\
+    game_context
 
-def rungame(scenario1, scenario2):
-    poff, coff, pdef, cdef, deck = start_game(scenario1, scenario2)
-    coff = set(coff)
-    cdef = set(cdef)
-    swapped = False
 
-    def play_strike():
+class GameState:
+    """State of a game at the start of a strike, enough to go on playing it
+
+    Card sets are trump-relative (see `cardset').  Players are numbered 0 and 1 (the 1st
+    and the 2nd player of `rungame').
+
+    trump: trump suit
+    deal: card sets dealt to the players
+    hands: card sets of the players now
+    deck: list of the cards left in the deck, in the order they will be dealt
+    attacker: the player who attacks in this strike
+    discard: card set of the beaten off cards
+    known: for each player, the cards it took from the table and still has
+    history: for each player, the list of values sent to it so far (see `Player.send').
+    The scenarios are rebuilt by replaying their histories (see `resume').
+    """
+    __slots__ = 'trump', 'deal', 'hands', 'deck', 'attacker', 'discard', 'known',\
+        'history'
+
+    def __init__(self, trump, deal, hands=None, deck=(), attacker=0, discard=0,
+                 known=(0, 0), history=((), ())):
+        self.trump = trump
+        self.deal = tuple(deal)
+        self.hands = list(deal if hands is None else hands)
+        self.deck = list(deck)
+        self.attacker = attacker
+        self.discard = discard
+        self.known = list(known)
+        self.history = [list(h) for h in history]
+
+    def clone(self):
+        return GameState(self.trump, self.deal, self.hands, self.deck, self.attacker,
+                         self.discard, self.known, self.history)
+
+    def dumps(self):
+        return pickle.dumps(
+            (self.trump, self.deal, self.hands, self.deck, self.attacker, self.discard,
+             self.known, self.history),
+            pickle.HIGHEST_PROTOCOL
+        )
+
+    @classmethod
+    def loads(cls, data):
+        return cls(*pickle.loads(data))
+
+    def __eq__(self, other):
+        return isinstance(other, GameState) and all(
+            getattr(self, attr) == getattr(other, attr) for attr in self.__slots__
+        )
+
+
+def rungame(scenario1, scenario2, rng=None, on_strike=None, recorder=None):
+    """Play a game, return True if the 1st player wins, False if the 2nd, None if draw
+
+    :param rng: random generator to deal with (see `common.game_random'), by default the
+    random module itself
+    :param on_strike: if given, it is called with the `GameState' at the start of every
+    strike.  The state is the live one: clone it to keep it.
+    :param recorder: if given, it records the game (see `gamelog.Recorder')
+    """
+    state = new_game(rng)
+    if recorder is not None:
+        recorder.begin(state)
+    result = play(state, start_players(state, scenario1, scenario2), on_strike, recorder)
+    if recorder is not None:
+        recorder.end(result)
+    return result
+
+
+def resume(state, scenario1, scenario2, on_strike=None):
+    """Play a game on from a `GameState', return as `rungame' does
+
+    The scenarios are rebuilt from the history of the state, so to get the same game as
+    the state was taken from, they must be the same (and deterministic) as there.
+    """
+    state = state.clone()
+    return play(state, start_players(state, scenario1, scenario2), on_strike)
+
+
+def new_game(rng=None):
+    """Deal a game, return its initial `GameState'"""
+    if rng is None:
+        rng = random
+    deck = random_deck(rng)
+    trump = random_suit(rng)
+    deck = list(map(game_context(trump).encoding.card, deck))
+    return GameState(
+        trump,
+        (union(deck[:NCARDS_PLAYER]), union(deck[NCARDS_PLAYER:NCARDS_PLAYER * 2])),
+        deck=deck[NCARDS_PLAYER * 2:]
+    )
+
+
+def start_players(state, scenario1, scenario2):
+    """Return the players of the state: dealt, then sent all their history"""
+    context = game_context(state.trump)
+    players = []
+    for i, scenario in enumerate((scenario1, scenario2)):
+        player = Player(scenario, state.deal[i], i == 0, context)
+        for value in state.history[i]:
+            player.send(value)
+        players.append(player)
+    return players
+
+
+def play(state, players, on_strike=None, recorder=None):
+    """Play the game on from the state (modified), return as `rungame' does"""
+    hands, deck, known, history = state.hands, state.deck, state.known, state.history
+
+    def send(i, value, request_code):
+        if recorder is not None:
+            recorder.event(request_code, value)
+        history[i].append(value)
+        players[i].send(value, request_code)
+
+    def play_strike(att, dfn):
         """Return True if the defensive player survived, False otherwise"""
+        poff, pdef = players[att], players[dfn]
+        coff, cdef = hands[att], hands[dfn]
         assert cdef
-        toff, tdef = set(), set()
-
-        while coff and cdef:  # strike loop
-            offcard = poff.value
-            pdef.send(offcard, rc.OFFCARD)
-            if offcard is None:
-                assert toff
-                break
-            coff.remove(offcard)
-            toff.add(offcard)
-
-            defcard = pdef.value  # Can be None or card
-            poff.send(defcard, rc.DEFCARD)
-
-            if defcard is None:
-                # Defensive player takes all the cards.
-                # Now: pdef waits for the set of unbeatables he takes.
-                unbeatables = poff.value
-                pdef.send(unbeatables, rc.UNBEATABLES)
-                cdef.update(toff, tdef, unbeatables)
-                coff.difference_update(unbeatables)
-                return False
-            else:
-                assert beats(defcard, offcard)
-                cdef.remove(defcard)
-                tdef.add(defcard)
+        toff, tdef = 0, 0
+
+        try:
+            while coff and cdef:  # strike loop
+                offcard = poff.value
+                send(dfn, offcard, rc.OFFCARD)
+                if offcard is None:
+                    assert toff
+                    break
+                coff ^= offcard
+                toff |= offcard
+
+                defcard = pdef.value  # Can be None or card
+                send(att, defcard, rc.DEFCARD)
+
+                if defcard is None:
+                    # Defensive player takes all the cards.
+                    # Now: pdef waits for the set of unbeatables he takes.
+                    unbeatables = poff.value
+                    send(dfn, unbeatables, rc.UNBEATABLES)
+                    cdef |= toff | tdef | unbeatables
+                    coff &= ~unbeatables
+                    known[att] &= coff
+                    known[dfn] |= toff | tdef | unbeatables
+                    return False
+                else:
+                    assert beats(defcard, offcard)
+                    cdef ^= defcard
+                    tdef |= defcard
 
-        return True
+            state.discard |= toff | tdef
+            known[att] &= coff
+            known[dfn] &= cdef
+            return True
+        finally:
+            hands[att], hands[dfn] = coff, cdef
 
-    def replenish_cards():
-        noff = min(len(deck), max(0, NCARDS_PLAYER - len(coff)))
-        roff = frozenset(deck[:noff])
+    def replenish_cards(att, dfn):
+        noff = min(len(deck), max(0, NCARDS_PLAYER - size(hands[att])))
+        roff = union(deck[:noff])
         del deck[:noff]
 
-        ndef = min(len(deck), max(0, NCARDS_PLAYER - len(cdef)))
-        rdef = frozenset(deck[:ndef])
+        ndef = min(len(deck), max(0, NCARDS_PLAYER - size(hands[dfn])))
+        rdef = union(deck[:ndef])
         del deck[:ndef]
 
-        poff.send(roff, rc.REPLENISHMENT)
-        pdef.send(rdef, rc.REPLENISHMENT)
-        poff.send(len(rdef), rc.NUM_RIVAL_REPLENISHMENT)
-        pdef.send(len(roff), rc.NUM_RIVAL_REPLENISHMENT)
+        send(att, roff, rc.REPLENISHMENT)
+        send(dfn, rdef, rc.REPLENISHMENT)
+        send(att, ndef, rc.NUM_RIVAL_REPLENISHMENT)
+        send(dfn, noff, rc.NUM_RIVAL_REPLENISHMENT)
 
-        coff.update(roff)
-        cdef.update(rdef)
+        hands[att] |= roff
+        hands[dfn] |= rdef
 
     while True:  # principal game loop
-        survived = play_strike()
-        replenish_cards()
-        if not coff or not cdef:
-            assert poff.request_code == rc.GAME_OVER
-            assert pdef.request_code == rc.GAME_OVER
-            if not coff and not cdef:
+        if on_strike is not None:
+            on_strike(state)
+        att, dfn = state.attacker, 1 - state.attacker
+        survived = play_strike(att, dfn)
+        replenish_cards(att, dfn)
+        if not hands[0] or not hands[1]:
+            assert players[0].request_code == rc.GAME_OVER
+            assert players[1].request_code == rc.GAME_OVER
+            if not hands[0] and not hands[1]:
                 return None
-            elif not coff:
-                return not swapped
             else:
-                return swapped
+                return not hands[0]
 
         if survived:
-            poff, pdef = pdef, poff
-            coff, cdef = cdef, coff
-            swapped = not swapped
-
-
-def start_game(scenario1, scenario2):
-    """Return (p1, cards1, p2, cards2, deck)"""
-    deck = random_deck()
-    gcxt.trump = random_suit()
-    cards1 = deck[:NCARDS_PLAYER]
-    p1 = Player(scenario1, frozenset(cards1), True)
-    cards2 = deck[NCARDS_PLAYER:NCARDS_PLAYER * 2]
-    p2 = Player(scenario2, frozenset(cards2), False)
-    del deck[:NCARDS_PLAYER * 2]
-    return p1, cards1, p2, cards2, deck
+            state.attacker = dfn
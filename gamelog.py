@@ -0,0 +1,219 @@
+"""Binary log of games.
+
+A log is a pair of append-only files: the games themselves at PATH and the offsets of
+the games in it at PATH.idx (8 bytes per game), for random access by game number.
+Every game is a record:
+
+    header (RECORD): seed (signed 64-bit), number, trump, result, number of events
+    deal: 36 bytes, the cards of the 1st player (6), of the 2nd one (6), then the deck
+    events: 1 byte per event
+
+A card is a byte: its trump-relative index (see `cardset.index_of'), so the trump is
+needed to map cards back to `Card' objects.  An event is the kind in the high 2 bits
+and the card index + 1 in the low 6 bits, 0 for no card:
+
+    OFFENCE: the attacker puts a card, or no card to end the strike
+    DEFENCE: the defender beats with a card, or no card to take
+    UNBEATABLE: a card given to the defender after it took, 1 event per card
+    REPLENISHMENT: no card to start the cards dealt from the deck to a player (to the
+    attacker, then to the defender, after every strike), then 1 event per card
+
+Record games with a `Recorder' passed to `game.rungame', read them with `GameLog'
+(memory-mapped) or `scan' (streaming).
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from collections import namedtuple
+
+from cardset import CARDS, index_of, iterate
+from common import SUITS, RequestCode as rc
+
+
+MAGIC = b'DURAKLG1'
+RECORD = struct.Struct('<qIBBH')  # seed, number, trump, result, number of events
+DEAL_SIZE = len(CARDS)
+
+# Event kinds
+OFFENCE, DEFENCE, UNBEATABLE, REPLENISHMENT = range(4)
+
+# Game results: as `game.rungame' returns them and as stored
+RESULT_CODES = {None: 0, True: 1, False: 2}
+RESULTS = {code: result for result, code in RESULT_CODES.items()}
+
+# Writes are buffered in blocks of about that many bytes
+BLOCK_SIZE = 1 << 16
+
+
+Game = namedtuple('Game', ('seed', 'number', 'trump', 'result', 'deal', 'events'))
+
+
+def event_byte(kind, card):
+    return kind << 6 | (index_of(card) + 1 if card is not None else 0)
+
+
+def decode_event(byte):
+    """Return (kind, card or None)"""
+    code = byte & 0x3f
+    return byte >> 6, CARDS[code - 1] if code else None
+
+
+def decode_events(events):
+    """List of (kind, card or None) of a game"""
+    return [decode_event(byte) for byte in events]
+
+
+class Recorder:
+    """Records a game played by `game.rungame', passes the record (bytes) to output"""
+
+    def __init__(self, output, seed=0, number=0):
+        self.output = output
+        self.seed = seed
+        self.number = number
+        self.trump = self.deal = None
+        self.events = bytearray()
+
+    def begin(self, state):
+        """Start with the initial `game.GameState'"""
+        self.trump = SUITS.index(state.trump)
+        self.deal = bytes(
+            [index_of(c) for c in iterate(state.deal[0])] +
+            [index_of(c) for c in iterate(state.deal[1])] +
+            [index_of(c) for c in state.deck]
+        )
+
+    def event(self, request_code, value):
+        """A value sent to a player"""
+        events = self.events
+        if request_code == rc.OFFCARD:
+            events.append(event_byte(OFFENCE, value))
+        elif request_code == rc.DEFCARD:
+            events.append(event_byte(DEFENCE, value))
+        elif request_code == rc.UNBEATABLES:
+            events.extend(event_byte(UNBEATABLE, c) for c in iterate(value))
+        elif request_code == rc.REPLENISHMENT:
+            events.append(REPLENISHMENT << 6)
+            events.extend(event_byte(REPLENISHMENT, c) for c in iterate(value))
+
+    def end(self, result):
+        self.output(
+            RECORD.pack(self.seed, self.number, self.trump, RESULT_CODES[result],
+                        len(self.events)) +
+            self.deal + self.events
+        )
+
+
+class GameLogWriter:
+    """Appends games to a log"""
+
+    def __init__(self, path, block_size=BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self.data = open(path, 'ab')
+        self.index = open(path + '.idx', 'ab')
+        if self.data.tell() == 0:
+            self.data.write(MAGIC)
+            self.data.flush()
+        self.offset = self.data.tell()
+        self.buffer = bytearray()
+        self.offsets = array('Q')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def recorder(self, seed=0, number=0):
+        return Recorder(self.write, seed, number)
+
+    def write(self, record):
+        """Append a game record (see `Recorder')"""
+        self.offsets.append(self.offset + len(self.buffer))
+        self.buffer += record
+        if len(self.buffer) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        # Games first: the index never points past the end of them
+        self.data.write(self.buffer)
+        self.data.flush()
+        self.index.write(self.offsets.tobytes())
+        self.index.flush()
+        self.offset += len(self.buffer)
+        self.buffer = bytearray()
+        self.offsets = array('Q')
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+
+def _parse(data, offset):
+    """Return (Game, offset of the next record)"""
+    seed, number, trump, result, n = RECORD.unpack_from(data, offset)
+    start = offset + RECORD.size
+    deal = bytes(data[start:start + DEAL_SIZE])
+    events = bytes(data[start + DEAL_SIZE:start + DEAL_SIZE + n])
+    return (
+        Game(seed, number, SUITS[trump], RESULTS[result], deal, events),
+        start + DEAL_SIZE + n
+    )
+
+
+class GameLog:
+    """Memory-mapped log: a sequence of `Game'"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("Not a game log: {}".format(path))
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = array('Q')
+        if os.path.getsize(path + '.idx'):
+            with open(path + '.idx', 'rb') as f:
+                self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.offsets = memoryview(self.index).cast('Q')
+        else:
+            self.index = None
+
+    def close(self):
+        self.offsets = array('Q')
+        if self.index is not None:
+            self.index.close()
+        self.data.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        return _parse(self.data, self.offsets[i])[0]
+
+    def __iter__(self):
+        data = self.data
+        for offset in self.offsets:
+            yield _parse(data, offset)[0]
+
+
+def scan(path, buffer_size=BLOCK_SIZE):
+    """Yield the games of a log, reading it sequentially (the index is not used)"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a game log: {}".format(path))
+        data = b''
+        offset = 0
+        while True:
+            chunk = f.read(buffer_size)
+            data = data[offset:] + chunk
+            offset = 0
+            while len(data) - offset >= RECORD.size:
+                n = RECORD.unpack_from(data, offset)[-1]
+                if len(data) - offset < RECORD.size + DEAL_SIZE + n:
+                    break
+                game, offset = _parse(data, offset)
+                yield game
+            if not chunk:
+                break
@@ -1,4 +1,7 @@
 """Module used to share global information between modules.
+
+Games do not use it: they pass `common.GameContext' around.  It is the default for the
+trump-dependent functions of `common' that are called without a trump.
 """
 
 # Current trump suit
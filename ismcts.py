@@ -0,0 +1,369 @@
+"""Information set Monte Carlo tree search scenario.
+
+The search tree is built over the moves of both players as we see them, from the first
+card to the end of the game.  Every iteration deals a possible rival hand and deck that
+agree with what we have seen (a determinization), walks down the tree choosing moves
+that are legal in that deal, adds a node and plays the game to the end with the `batch'
+dumb policy.  Moves of the rival are chosen as the best ones for it.  Once the game is
+open, it continues as `smartest'.
+
+The tree is kept for the whole game: after every move (ours or the rival's) and every
+replenishment of our cards, the current node moves down to the corresponding child, so
+what was searched before is reused.  Node statistics are kept in arrays, indexed by
+node number; the only per-node Python objects are the keys of the edge dict.
+"""
+
+import math
+import random
+import time
+from array import array
+
+import smartest
+from batch import DUMB, ATTACK, DEFEND, GIVE, playout
+from cardset import FULL, NUM_CARDS, beaters, matching, unbeatables, iterate, size,\
+    weakest_n
+from common import RequestCode as rc, NCARDS_PLAYER
+
+
+# Search iterations per move
+ITERATIONS = 200
+
+# Exploration constant of UCB
+EXPLORATION = 0.7
+
+POLICIES = (DUMB, DUMB)
+
+SCORES = {True: 1.0, None: 0.5, False: 0.0}
+
+
+class Tree:
+    """Search tree.  Nodes are numbers, 0 is the root
+
+    visits[node]: number of iterations that went through the node
+    total[node]: sum of their scores (1 for our win, 0.5 for a draw)
+    avail[node]: number of iterations in which the move to the node was legal
+    """
+
+    def __init__(self):
+        self.visits = array('l', [0])
+        self.total = array('d', [0.0])
+        self.avail = array('l', [0])
+        self.children = {}  # (node, move) -> node
+
+    def __len__(self):
+        return len(self.visits)
+
+    def child(self, node, move):
+        """Child of node by move, added if missing"""
+        key = node, move
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = len(self.visits)
+            self.visits.append(0)
+            self.total.append(0.0)
+            self.avail.append(0)
+        return child
+
+
+class State:
+    """State of a game being simulated.  Player 0 is us, 1 is the rival
+
+    deck[top:] is the deck.  result is None while the game goes on, then it is the
+    score of the game (see SCORES).
+    """
+    __slots__ = 'hands', 'deck', 'top', 'att', 'toff', 'tdef', 'phase', 'offcard',\
+        'discard', 'result'
+
+    def __init__(self, hands, deck, top, att, toff, tdef, phase, offcard, discard):
+        self.hands = hands
+        self.deck = deck
+        self.top = top
+        self.att = att
+        self.toff = toff
+        self.tdef = tdef
+        self.phase = phase
+        self.offcard = offcard
+        self.discard = discard
+        self.result = None
+
+    def player(self):
+        """Who is to move"""
+        return 1 - self.att if self.phase == DEFEND else self.att
+
+    def moves(self):
+        coff, cdef = self.hands[self.att], self.hands[1 - self.att]
+        if self.phase == ATTACK:
+            if not self.toff:
+                return list(iterate(coff))
+            return list(iterate(matching(coff, self.toff | self.tdef))) + [None]
+        elif self.phase == DEFEND:
+            return list(iterate(beaters(cdef, self.offcard))) + [None]
+        else:
+            unb = unbeatables(coff, self.toff | self.tdef, size(cdef) - 1)
+            return [weakest_n(unb, n) for n in range(size(unb) + 1)]
+
+    def apply(self, move):
+        """Make the move.  If it ends the strike, return the cards we got from the deck"""
+        att, dfn = self.att, 1 - self.att
+        hands = self.hands
+        if self.phase == ATTACK:
+            if move is None:
+                return self.end_strike(True)
+            hands[att] ^= move
+            self.toff |= move
+            self.offcard = move
+            self.phase = DEFEND
+        elif self.phase == DEFEND:
+            if move is None:
+                self.phase = GIVE
+                return None
+            hands[dfn] ^= move
+            self.tdef |= move
+            self.phase = ATTACK
+            if not hands[att] or not hands[dfn]:
+                return self.end_strike(True)
+        else:
+            hands[att] &= ~move
+            hands[dfn] |= self.toff | self.tdef | move
+            return self.end_strike(False)
+        return None
+
+    def end_strike(self, survived):
+        att, dfn = self.att, 1 - self.att
+        hands, deck = self.hands, self.deck
+        if survived:
+            self.discard |= self.toff | self.tdef
+        self.toff = self.tdef = 0
+        self.phase = ATTACK
+
+        ours = 0
+        for player in (att, dfn):
+            n = min(NUM_CARDS - self.top, max(0, NCARDS_PLAYER - size(hands[player])))
+            cards = sum(deck[self.top:self.top + n])
+            self.top += n
+            hands[player] |= cards
+            if player == 0:
+                ours = cards
+
+        if not hands[0] or not hands[1]:
+            self.result = 0.5 if not hands[0] and not hands[1] else float(not hands[0])
+        elif survived:
+            self.att = dfn
+        return ours
+
+
+def scenario(send, cards, iattack, iterations=ITERATIONS, seconds=None,
+             when_open_game=smartest.decision_scenario):
+    """ISMCTS scenario
+
+    :param iterations: search iterations per move
+    :param seconds: if given, stop searching after that much time (at least 1 iteration)
+    :param when_open_game: scenario to continue with once the game is open, as in
+    `smart.scenario'.  If None, the search goes on to the end of the game.
+    """
+    rng = random.Random(cards)
+    tree = Tree()
+    node = 0  # current node
+    rival_num_unknowns = NCARDS_PLAYER
+    blackset = FULL & ~cards
+    rival_knowns = 0
+    discard = 0
+    att = 0 if iattack else 1
+
+    def rival_num():
+        return rival_num_unknowns + size(rival_knowns)
+
+    def is_eog():
+        return not cards or rival_num() == 0
+
+    def observe(move):
+        nonlocal node
+        node = tree.child(node, move)
+
+    def determinize(toff, tdef, phase, offcard):
+        unknowns = list(iterate(blackset))
+        rng.shuffle(unknowns)
+        top = NUM_CARDS - (len(unknowns) - rival_num_unknowns)
+        return State(
+            [cards, rival_knowns + sum(unknowns[:rival_num_unknowns])],
+            [0] * top + unknowns[rival_num_unknowns:], top,
+            att, toff, tdef, phase, offcard, discard
+        )
+
+    def search(state):
+        """1 iteration from the current node"""
+        visits, total, avail = tree.visits, tree.total, tree.avail
+        current = node
+        path = [current]
+
+        while state.result is None:
+            moves = state.moves()
+            children = [tree.children.get((current, move)) for move in moves]
+            for child in children:
+                if child is not None:
+                    avail[child] += 1
+            untried = [
+                move for move, child in zip(moves, children)
+                if child is None or not visits[child]
+            ]
+
+            if untried:
+                move = rng.choice(untried)
+                child = children[moves.index(move)]
+                if child is None:
+                    # A new node, not counted as available above
+                    child = tree.child(current, move)
+                    avail[child] += 1
+            else:
+                ours = state.player() == 0
+                log_avail = [math.log(avail[child]) for child in children]
+                best = None
+                for move, child, log_n in zip(moves, children, log_avail):
+                    mean = total[child] / visits[child]
+                    ucb = (mean if ours else 1 - mean) + \
+                        EXPLORATION * math.sqrt(log_n / visits[child])
+                    if best is None or ucb > best[0]:
+                        best = ucb, move, child
+                ucb, move, child = best
+
+            dealt = state.apply(move)
+            current = child
+            path.append(current)
+            if dealt is not None and state.result is None:
+                current = tree.child(current, ('deal', dealt))
+                path.append(current)
+            if untried:
+                break
+
+        if state.result is not None:
+            score = state.result
+        else:
+            score = SCORES[playout(
+                POLICIES, state.hands, state.deck, state.top, state.att, [0, 0],
+                state.discard, state.toff, state.tdef, state.phase, state.offcard
+            )]
+
+        for n in path:
+            visits[n] += 1
+            total[n] += score
+
+    def decide(moves, toff, tdef, phase, offcard=None):
+        """Search, return the most visited of moves"""
+        if len(moves) == 1:
+            return moves[0]
+        deadline = time.perf_counter() + seconds if seconds is not None else None
+        for i in range(iterations):
+            search(determinize(toff, tdef, phase, offcard))
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+        def visits(move):
+            child = tree.children.get((node, move))
+            return tree.visits[child] if child is not None else -1
+
+        return max(moves, key=visits)
+
+    def end_strike(survived, toff, tdef):
+        nonlocal discard, att
+        if survived:
+            discard |= toff | tdef
+            att = 1 - att
+
+    def offense():
+        """Return True if we attack next"""
+        nonlocal rival_num_unknowns, rival_knowns, cards, blackset
+
+        toff, tdef = 0, 0
+        while not is_eog():
+            if not toff:
+                moves = list(iterate(cards))
+            else:
+                moves = list(iterate(matching(cards, toff | tdef))) + [None]
+            offcard = decide(moves, toff, tdef, ATTACK)
+
+            send(offcard)
+            observe(offcard)
+            if offcard is None:
+                break
+            cards ^= offcard
+            toff |= offcard
+
+            defcard = yield rc.DEFCARD
+            observe(defcard)
+            if defcard is None:
+                table = toff | tdef
+                unb = unbeatables(cards, table, rival_num() - 1)
+                moves = [weakest_n(unb, n) for n in range(size(unb) + 1)]
+                unb = decide(moves, toff, tdef, GIVE)
+                cards &= ~unb
+                rival_knowns |= table | unb
+                send(unb)
+                observe(unb)
+                end_strike(False, toff, tdef)
+                return True
+
+            tdef |= defcard
+            if defcard & rival_knowns:
+                rival_knowns ^= defcard
+            else:
+                blackset ^= defcard
+                rival_num_unknowns -= 1
+
+        end_strike(True, toff, tdef)
+        return False
+
+    def defense():
+        """Return True if we survived"""
+        nonlocal rival_num_unknowns, rival_knowns, cards, blackset
+
+        toff, tdef = 0, 0
+        while not is_eog():
+            offcard = yield rc.OFFCARD
+            observe(offcard)
+            if offcard is None:
+                break
+
+            toff |= offcard
+            if offcard & rival_knowns:
+                rival_knowns ^= offcard
+            else:
+                blackset ^= offcard
+                rival_num_unknowns -= 1
+
+            moves = list(iterate(beaters(cards, offcard))) + [None]
+            defcard = decide(moves, toff, tdef, DEFEND, offcard)
+            send(defcard)
+            observe(defcard)
+            if defcard is None:
+                unb = yield rc.UNBEATABLES
+                observe(unb)
+                toff |= unb
+                cards |= toff | tdef
+                rival_knowns &= ~unb
+                rival_num_unknowns -= size(blackset & unb)
+                blackset &= ~unb
+                end_strike(False, toff, tdef)
+                return False
+
+            cards ^= defcard
+            tdef |= defcard
+
+        end_strike(True, toff, tdef)
+        return True
+
+    while not is_eog():
+        iattack = (yield from offense()) if iattack else (yield from defense())
+        my_replenishment = yield rc.REPLENISHMENT
+        observe(('deal', my_replenishment))
+        blackset &= ~my_replenishment
+        cards |= my_replenishment
+        rival_num_unknowns += yield rc.NUM_RIVAL_REPLENISHMENT
+        if blackset and rival_num_unknowns == size(blackset):
+            rival_num_unknowns = 0
+            rival_knowns |= blackset
+            blackset = 0
+            if when_open_game:
+                yield from when_open_game(send, cards, rival_knowns, iattack)
+                break
+
+    yield rc.GAME_OVER
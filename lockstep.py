@@ -0,0 +1,288 @@
+"""Batch game engine on NumPy arrays: the dumb and smart strategies in lockstep.
+
+The same games as in `batch', but all the games of a batch are played at once: the
+state of every game is a row of arrays (card sets are uint64 bitmasks, see `cardset'),
+and every step makes the next decision in all the games that are not over yet.  The
+policies are the ones of `batch' written for arrays, so on the same deals the results
+are the same as those of `batch.play' and `game.rungame'.
+
+Card sets are kept by role, not by player: the attacker's and the defender's, and
+`second' tells whether the 2nd player attacks.  No card is 0 (where `batch' has None).
+"""
+
+from collections import Counter
+
+import numpy as np
+
+import batch
+from batch import Policy, ATTACK, DEFEND, GIVE
+from cardset import CARDS, FULL, NUM_CARDS, VALUE, BEATEN_BY, MATCHING
+from common import NCARDS_PLAYER
+from gamelog import RESULTS
+
+
+ONE = np.uint64(1)
+FULL_MASK = np.uint64(FULL)
+
+# Card index -> its bit, card value, the bits of the cards that beat it
+BITS = np.array(CARDS, np.uint64)
+VALUES = np.array([VALUE[card] for card in CARDS], np.int64)
+BEATERS = np.array([BEATEN_BY[card] for card in CARDS], np.uint64)
+
+# Card sets are looked up by 9-bit chunks: chunk k of a set -> value sum, matching cards
+_CHUNK = 9
+_CHUNKS = range(NUM_CARDS // _CHUNK)
+_VALUE_SUMS = np.array([
+    [sum(VALUES[k * _CHUNK + j] for j in range(_CHUNK) if m >> j & 1)
+     for m in range(1 << _CHUNK)]
+    for k in _CHUNKS
+], np.int64)
+_MATCHING = np.array([
+    [np.bitwise_or.reduce([MATCHING[CARDS[k * _CHUNK + j]]
+                           for j in range(_CHUNK) if m >> j & 1] + [0])
+     for m in range(1 << _CHUNK)]
+    for k in _CHUNKS
+], np.uint64)
+_CHUNK_MASK = np.uint64((1 << _CHUNK) - 1)
+
+# Sizes of bytes, for NumPy without bitwise_count
+_BYTE_SIZES = np.array([bin(i).count('1') for i in range(256)], np.int64)
+
+
+def size(cards):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(cards).astype(np.int64)
+    return _BYTE_SIZES[cards.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def weakest(cards):
+    """The weakest card of every set, 0 for empty sets"""
+    return cards & (~cards + ONE)
+
+
+def index_of(cards):
+    """Index of every card (single-card sets)"""
+    return size(cards - ONE)
+
+
+def chunk(cards, k):
+    return ((cards >> np.uint64(k * _CHUNK)) & _CHUNK_MASK).astype(np.int64)
+
+
+def total_value(cards):
+    return sum(_VALUE_SUMS[k][chunk(cards, k)] for k in _CHUNKS)
+
+
+def mean_value(cards):
+    """Mean card value of every set, 0.0 for empty sets"""
+    n = size(cards)
+    return np.divide(total_value(cards), n, out=np.zeros(len(cards)), where=n > 0)
+
+
+def matching(cards, table):
+    allowed = _MATCHING[0][chunk(table, 0)]
+    for k in _CHUNKS[1:]:
+        allowed |= _MATCHING[k][chunk(table, k)]
+    return cards & allowed
+
+
+def beaters(cards, card):
+    return cards & BEATERS[index_of(card)]
+
+
+def weakest_n(cards, n):
+    """Set of at most n weakest cards of every set"""
+    res = np.zeros(len(cards), np.uint64)
+    n = n.copy()
+    while True:
+        take = (cards != 0) & (n > 0)
+        if not take.any():
+            return res
+        card = np.where(take, weakest(cards), 0)
+        res |= card
+        cards = cards ^ card
+        n -= take
+
+
+def unbeatables(cards, table, maxn):
+    return weakest_n(matching(cards, table), maxn)
+
+
+def not_above(mean):
+    """Set of the cards of value <= mean, for every mean
+
+    Card values do not decrease with the bit index, so it is the cards below some bit.
+    """
+    n = np.searchsorted(VALUES, mean, side='right').astype(np.uint64)
+    return (ONE << n) - ONE
+
+
+def dumb_attack(hand, toff, tdef, nrival, blackset):
+    return weakest(np.where(toff != 0, matching(hand, toff | tdef), hand))
+
+
+def dumb_defend(hand, offcard, table, blackset):
+    return weakest(beaters(hand, offcard))
+
+
+def dumb_give(hand, table, nrival, blackset):
+    return unbeatables(hand, table, nrival - 1)
+
+
+DUMB = Policy(dumb_attack, dumb_defend, dumb_give, False)
+
+
+def smart_attack(hand, toff, tdef, nrival, blackset):
+    card = weakest(np.where(toff != 0, matching(hand, toff | tdef), hand))
+    # (The value of no card is garbage, it is not kept anyway)
+    keep = (toff == 0) | (blackset == 0) | \
+        (VALUES[index_of(card) % NUM_CARDS] <= mean_value(blackset))
+    return np.where(keep, card, 0)
+
+
+def smart_defend(hand, offcard, table, blackset):
+    card = weakest(beaters(hand, offcard))
+    # Give up if the cards we'd have after beating are weaker than the ones we'd take
+    giveup_mean = mean_value(table | hand)
+    n_old = size(hand) - 1
+    n_new = np.maximum(0, NCARDS_PLAYER - n_old)
+    beat_mean = (total_value(hand ^ card) + mean_value(blackset) * n_new) / \
+        (n_old + n_new)
+    return np.where((blackset != 0) & (giveup_mean > beat_mean), 0, card)
+
+
+def smart_give(hand, table, nrival, blackset):
+    unb = unbeatables(hand, table, nrival - 1)
+    return np.where(blackset != 0, unb & not_above(mean_value(blackset)), unb)
+
+
+SMART = Policy(smart_attack, smart_defend, smart_give, True)
+
+POLICIES = {
+    'dumb': DUMB,
+    'smart': SMART,
+}
+
+
+def decide(policies, players, name, *args):
+    """Decision `name' of the players' policies, args are arrays over the games"""
+    if policies[0] is policies[1]:
+        return getattr(policies[0], name)(*args)
+    res = np.zeros(len(players), np.uint64)
+    for player in (0, 1):
+        these = players == player
+        res[these] = getattr(policies[player], name)(*(a[these] for a in args))
+    return res
+
+
+def deal(n, seed=None, first=0):
+    """(n, 36) card indices, dealt as `batch.deal' does if seed is given"""
+    if seed is not None:
+        decks, trumps = batch.deal(n, seed, first)
+        return np.frombuffer(decks, np.uint8).reshape(n, NUM_CARDS)
+    return np.random.default_rng().random((n, NUM_CARDS)).argsort(axis=1)
+
+
+def play(decks, policy1, policy2):
+    """Play the games dealt in decks ((games, 36) card indices), return the array of
+    results: 0 draw, 1 the 1st player wins, 2 the 2nd one wins (as in `gamelog')"""
+    policies = policy1, policy2
+    informed = np.array([policy1.informed, policy2.informed])
+    # Deck cards from top to top + n of game i: prefix[i, top + n] - prefix[i, top]
+    prefix = np.zeros((len(decks), NUM_CARDS + 1), np.uint64)
+    np.cumsum(BITS[decks], axis=1, out=prefix[:, 1:])
+    results = np.zeros(len(decks), np.int8)
+
+    # State of the games that are not over yet, game ids[i] in row i
+    ids = np.arange(len(decks))
+    coff = prefix[:, NCARDS_PLAYER].copy()
+    cdef = prefix[:, 2 * NCARDS_PLAYER] - coff
+    second = np.zeros(len(decks), bool)
+    top = np.full(len(decks), 2 * NCARDS_PLAYER)
+    toff, tdef, offcard, discard, koff, kdef = \
+        (np.zeros(len(decks), np.uint64) for i in range(6))
+    phase = np.full(len(decks), ATTACK, np.int8)
+
+    def blackset(i, player, hand, known):
+        """What the player of games i has not seen, 0 if it does not need it"""
+        seen = hand | discard[i] | toff[i] | tdef[i] | known
+        return np.where(informed[player] & (top[i] < NUM_CARDS), FULL_MASK & ~seen, 0)
+
+    while len(ids):
+        end = np.zeros(len(ids), bool)
+        survived = np.ones(len(ids), bool)
+
+        # Attack, or end the strike
+        attacking = phase == ATTACK
+        end |= attacking & ((coff == 0) | (cdef == 0))
+        i = np.flatnonzero(attacking & ~end)
+        player = second[i].astype(np.int64)
+        card = decide(policies, player, 'attack', coff[i], toff[i], tdef[i],
+                      size(cdef[i]), blackset(i, player, coff[i], kdef[i]))
+        end[i[card == 0]] = True
+        i, card = i[card != 0], card[card != 0]
+        coff[i] ^= card
+        toff[i] |= card
+        koff[i] &= ~card
+        offcard[i] = card
+        phase[i] = DEFEND
+
+        # Beat or take
+        i = np.flatnonzero(phase == DEFEND)
+        player = 1 - second[i].astype(np.int64)
+        card = decide(policies, player, 'defend', cdef[i], offcard[i],
+                      toff[i] | tdef[i], blackset(i, player, cdef[i], koff[i]))
+        phase[i[card == 0]] = GIVE
+        i, card = i[card != 0], card[card != 0]
+        cdef[i] ^= card
+        tdef[i] |= card
+        kdef[i] &= ~card
+        phase[i] = ATTACK
+
+        # Give unbeatables to the one who took
+        i = np.flatnonzero(phase == GIVE)
+        player = second[i].astype(np.int64)
+        table = toff[i] | tdef[i]
+        unb = decide(policies, player, 'give', coff[i], table, size(cdef[i]),
+                     blackset(i, player, coff[i], kdef[i]))
+        coff[i] &= ~unb
+        koff[i] &= ~unb
+        cdef[i] |= table | unb
+        kdef[i] |= table | unb
+        survived[i] = False
+        end[i] = True
+
+        # End of strike: replenish, check for the end of the game
+        i = np.flatnonzero(end)
+        discard[i] |= np.where(survived[i], toff[i] | tdef[i], 0)
+        toff[i] = tdef[i] = 0
+        phase[i] = ATTACK
+        for hand in (coff, cdef):
+            n = np.minimum(NUM_CARDS - top[i], np.maximum(0, NCARDS_PLAYER - size(hand[i])))
+            hand[i] |= prefix[ids[i], top[i] + n] - prefix[ids[i], top[i]]
+            top[i] += n
+
+        over = end & ((coff == 0) | (cdef == 0))
+        # The one out of cards wins: 1st (code 1) or 2nd (code 2) player
+        winner = np.where(coff == 0, second, ~second).astype(np.int8) + 1
+        results[ids[over]] = np.where((coff == 0) & (cdef == 0), 0, winner)[over]
+
+        swap = end & survived & ~over
+        coff[swap], cdef[swap] = cdef[swap], coff[swap]
+        koff[swap], kdef[swap] = kdef[swap], koff[swap]
+        second[swap] = ~second[swap]
+
+        if over.any():
+            live = ~over
+            ids, coff, cdef, second, top, toff, tdef, offcard, discard, koff, kdef, \
+                phase = (a[live] for a in (ids, coff, cdef, second, top, toff, tdef,
+                                           offcard, discard, koff, kdef, phase))
+
+    return results
+
+
+def run(n, policy1, policy2, seed=None, first=0):
+    """Deal and play n games, return Counter of results (as `batch.run' does)"""
+    codes = np.bincount(play(deal(n, seed, first), policy1, policy2), minlength=3)
+    return Counter({RESULTS[code]: int(count) for code, count in enumerate(codes)
+                    if count})
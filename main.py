@@ -1,69 +1,217 @@
 import os
+import random
 from argparse import ArgumentParser
-from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import gcxt
+import decision_tree
+import endgame
+from tablebase import Tablebase
+from transposition import TranspositionTable, DEFAULT_CAPACITY
 from dumb import scenario as dumb_scenario
 from smart import scenario as smart_scenario
 from smartest import scenario as smartest_scenario
+from common import game_random
+from results import Tally, StoppingRule, Z_SCORES, append_record
+from searchstats import SearchStats
 from game import rungame
+from gamelog import GameLogWriter, Recorder
+
+
+# Chunks shrink as the run goes, down to MIN_CHUNK games.  Each worker gets about
+# CHUNKS_PER_WORKER chunks of what remains, so there is little left to wait for when
+# the other workers are done.
+MIN_CHUNK = 1
+CHUNKS_PER_WORKER = 4
+
+# If set to a `gamelog.GameLogWriter', the games played are written to it
+game_log = None
+
+
+def schedule(first, N, workers):
+    """Yield (start, n): chunks that split games first, ..., first + N - 1 exactly"""
+    start, stop = first, first + N
+    while start < stop:
+        n = max(MIN_CHUNK, (stop - start) // (workers * CHUNKS_PER_WORKER))
+        n = min(n, stop - start)
+        yield start, n
+        start += n
+
+
+def launch_parallel(N, seed, first=0, workers=None, rule=None):
+    """Play games number first, first + 1, ..., first + N - 1 of the run with seed
+
+    :param rule: `results.StoppingRule', checked as chunks of games come in
+    :return: (Tally, reason to stop or None)
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    tally = Tally()
+    table = decision_tree.shared_table
+    stats = decision_tree.stats
+    reason = None
+
+    with ProcessPoolExecutor(workers) as exe:
+        futures = [
+            exe.submit(launch_n_tasks, seed, start, n)
+            for start, n in schedule(first, N, workers)
+        ]
+        for f in as_completed(futures):
+            res, fresh, table_stats, search_stats, records = f.result()
+            tally.update(res)
+            if game_log is not None:
+                for record in records:
+                    game_log.write(record)
+            if table is not None:
+                table.update(fresh)
+                table.add_counters(table_stats)
+            if stats is not None:
+                stats.update(search_stats)
+            print(tally.games, "of", N, "processed:", tally.summary(rule_z(rule)))
+            reason = rule and rule.reason_to_stop(tally)
+            if reason:
+                for f in futures:
+                    f.cancel()
+                break
+
+    return tally, reason
+
+
+def launch_n_tasks(seed, first, N):
+    """Return (Counter of results, fresh table entries, table stats, search stats, log)
+
+    Everything is of these N games.  Search stats are None unless collected (see
+    `decision_tree.stats'), log is the list of game records if `game_log' is set.
+    """
+    table = decision_tree.shared_table
+    if table is not None:
+        table.track_fresh()
+        counters = table.counters()
+    if decision_tree.stats is not None:
+        decision_tree.stats = SearchStats()
+
+    records = []
+    res = Counter(
+        launch_1_game(
+            game_random(seed, first + i),
+            Recorder(records.append, seed, first + i) if game_log is not None else None
+        )
+        for i in range(N)
+    )
 
+    if table is None:
+        return res, [], None, decision_tree.stats, records
+    else:
+        return res, table.take_fresh(), {
+            name: n - counters[name] for name, n in table.counters().items()
+        }, decision_tree.stats, records
 
-def launch_parallel(N):
-    with ProcessPoolExecutor() as exe:
-        M = N
-        chunk = N // os.cpu_count()
-        futures = []
-        while M > 0:
-            futures.append(exe.submit(launch_n_tasks, chunk, M == N))
-            M -= chunk
-
-    results = [x for f in futures for x in f.result()]
-    print('total futures', len(futures))
-    w1 = sum(1 for r in results if r is True)
-    w2 = sum(1 for r in results if r is False)
-    d = sum(1 for r in results if r is None)
-
-    print("Results: ", w1, d, w2)
 
+def launch_in_1_process(N, seed, first=0, rule=None):
+    """Same as `launch_parallel', in this process"""
+    tally = Tally()
+    reason = None
 
-def launch_n_tasks(N, doprint=False):
-    res = []
     for i in range(N):
-        res.append(launch_1_game())
-        if doprint:
-            print(i, "processed")
-    return res
+        recorder = game_log and game_log.recorder(seed, first + i)
+        tally.update([launch_1_game(game_random(seed, first + i), recorder)])
+        if (i + 1) % 100 == 0:
+            print(tally.games, "of", N, "processed:", tally.summary(rule_z(rule)))
+            reason = rule and rule.reason_to_stop(tally)
+            if reason:
+                break
 
+    return tally, reason
 
-def launch_in_1_process(N):
-    results = []
-
-    for i in range(N):
-        results.append(launch_1_game())
-        #print(i, "processed")
-        if i % 1000 == 0:
-            print(i, "processed")
 
-    w1 = sum(1 for r in results if r is True)
-    w2 = sum(1 for r in results if r is False)
-    d = sum(1 for r in results if r is None)
-    print("Results: ", w1, d, w2)
+def rule_z(rule):
+    return rule.z if rule is not None else Z_SCORES[0.95]
 
 
-def launch_1_game():
+def launch_1_game(rng, recorder=None):
     return rungame(
         smartest_scenario,
         smartest_scenario,
+        rng,
+        recorder=recorder,
     )
 
 
 def main():
     parser = ArgumentParser()
     parser.add_argument('N', type=int)
+    parser.add_argument('--seed', type=int,
+                        help="master seed of the run; random and printed if not given")
+    parser.add_argument('--first', type=int, default=0,
+                        help="number of the first game to play in the run")
+    parser.add_argument('--workers', type=int,
+                        help="number of worker processes, CPU count by default")
+    parser.add_argument('--precision', type=float,
+                        help="stop once the score is known within +-PRECISION")
+    parser.add_argument('--separate', action='store_true',
+                        help="stop once one of the players is clearly better")
+    parser.add_argument('--confidence', type=float, default=0.99,
+                        choices=sorted(Z_SCORES), help="confidence level of intervals")
+    parser.add_argument('--results', metavar='FILE',
+                        help="file to append the results of the run to, as JSON lines")
+    parser.add_argument('--tablebase', metavar='FILE',
+                        help="tablebase of open positions (see `tablebase')")
+    parser.add_argument('--table', metavar='FILE',
+                        help="transposition table file, loaded at start and saved at end")
+    parser.add_argument('--table-size', type=int, default=DEFAULT_CAPACITY,
+                        help="max number of transposition table entries")
+    parser.add_argument('--search-stats', metavar='FILE',
+                        help="collect decision tree search statistics, write them to FILE")
+    parser.add_argument('--log', metavar='FILE',
+                        help="binary game log to append the games to (see `gamelog')")
     args = parser.parse_args()
-    #launch_in_1_process(args.N)
-    launch_parallel(args.N)
+    seed = args.seed
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    elif args.log and not -2 ** 63 <= seed < 2 ** 63:
+        parser.error("--seed must fit in 64 bits (signed) to be logged")
+    print("Seed", seed)
+
+    if args.tablebase:
+        endgame.tablebase = Tablebase(args.tablebase)
+
+    if args.table:
+        decision_tree.shared_table = TranspositionTable.load(args.table, args.table_size)
+        print("Loaded", len(decision_tree.shared_table), "table entries")
+
+    if args.search_stats:
+        decision_tree.stats = SearchStats()
+
+    global game_log
+    if args.log:
+        game_log = GameLogWriter(args.log)
+
+    rule = StoppingRule(args.precision, args.separate, args.confidence)
+    #tally, reason = launch_in_1_process(args.N, seed, args.first, rule)
+    tally, reason = launch_parallel(args.N, seed, args.first, args.workers, rule)
+    print("Results: ", tally.summary(rule.z))
+    if reason:
+        print("Stopped early:", reason)
+    if args.results:
+        append_record(args.results, tally.record(
+            rule.z, player1='smartest', player2='smartest', seed=seed, first=args.first,
+            stopped=reason, confidence=args.confidence,
+        ))
+
+    if args.table:
+        table = decision_tree.shared_table
+        print(table.report())
+        table.save(args.table)
+
+    if args.search_stats:
+        with open(args.search_stats, 'w') as f:
+            f.write(decision_tree.stats.report() + '\n')
+        print("Search statistics written to", args.search_stats)
+
+    if args.log:
+        game_log.close()
+        print("Games logged to", args.log)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,164 @@
+"""Monte Carlo player for the hidden part of the game (determinization).
+
+While the deck is not empty, the rival's hand is partially unknown.  For every decision
+this player deals many possible rival hands and decks that agree with what it has seen,
+plays each move to the end of the game on each of the deals with the `batch' smart
+policy for both players, and makes the move with the best average result.  All the
+moves are tried on the same deals, which makes the comparison of moves less noisy.
+
+Once the game is open, it continues as `smartest'.
+"""
+
+import random
+import time
+
+import smartest
+from batch import SMART, ATTACK, DEFEND, GIVE, playout
+from cardset import FULL, NUM_CARDS, beaters, matching, unbeatables, iterate, size,\
+    weakest_n
+from common import RequestCode as rc, NCARDS_PLAYER
+
+
+# Deals per decision
+SAMPLES = 24
+
+POLICIES = (SMART, SMART)
+
+SCORES = {True: 1.0, None: 0.5, False: 0.0}
+
+
+def scenario(send, cards, iattack, samples=SAMPLES, seconds=None):
+    """Determinization scenario
+
+    :param samples: number of deals to try the moves on
+    :param seconds: if given, stop dealing after that much time (at least 1 deal)
+    """
+    rng = random.Random(cards)
+    rival_num_unknowns = NCARDS_PLAYER
+    blackset = FULL & ~cards
+    rival_knowns = 0
+    my_knowns = 0  # our cards that the rival knows
+
+    def rival_num():
+        return rival_num_unknowns + size(rival_knowns)
+
+    def is_eog():
+        return not cards or rival_num() == 0
+
+    def decide(moves, phase, toff, tdef, offcard=None):
+        """Return the best of moves (list), ties are broken in favour of earlier ones"""
+        if len(moves) == 1:
+            return moves[0]
+
+        unknowns = list(iterate(blackset))
+        top = NUM_CARDS - (len(unknowns) - rival_num_unknowns)
+        discard = FULL & ~(cards | blackset | rival_knowns | toff | tdef)
+        att = 1 if phase == DEFEND else 0
+        totals = [0.0] * len(moves)
+        deadline = time.perf_counter() + seconds if seconds is not None else None
+
+        for i in range(samples):
+            rng.shuffle(unknowns)
+            rival = rival_knowns + sum(unknowns[:rival_num_unknowns])
+            # The deck is at the end of the list, as though the rest was already dealt
+            deck = [0] * top + unknowns[rival_num_unknowns:]
+            for j, move in enumerate(moves):
+                res = playout(
+                    POLICIES, [cards, rival], deck, top, att, [my_knowns, rival_knowns],
+                    discard, toff, tdef, phase, offcard, move
+                )
+                totals[j] += SCORES[res]
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+        return moves[max(range(len(moves)), key=lambda j: (totals[j], -j))]
+
+    def offense():
+        """Return True if we attack next"""
+        nonlocal rival_num_unknowns, rival_knowns, my_knowns, cards, blackset
+
+        toff, tdef = 0, 0
+        while not is_eog():
+            if not toff:
+                moves = list(iterate(cards))
+            else:
+                moves = list(iterate(matching(cards, toff | tdef))) + [None]
+            offcard = decide(moves, ATTACK, toff, tdef)
+
+            send(offcard)
+            if offcard is None:
+                break
+            cards ^= offcard
+            my_knowns &= ~offcard
+            toff |= offcard
+
+            defcard = yield rc.DEFCARD
+            if defcard is None:
+                table = toff | tdef
+                unb = unbeatables(cards, table, rival_num() - 1)
+                moves = [weakest_n(unb, n) for n in range(size(unb) + 1)]
+                unb = decide(moves, GIVE, toff, tdef)
+                cards &= ~unb
+                my_knowns &= ~unb
+                rival_knowns |= table | unb
+                send(unb)
+                return True
+
+            tdef |= defcard
+            if defcard & rival_knowns:
+                rival_knowns ^= defcard
+            else:
+                blackset ^= defcard
+                rival_num_unknowns -= 1
+
+        return False
+
+    def defense():
+        """Return True if we survived"""
+        nonlocal rival_num_unknowns, rival_knowns, my_knowns, cards, blackset
+
+        toff, tdef = 0, 0
+        while not is_eog():
+            offcard = yield rc.OFFCARD
+            if offcard is None:
+                break
+
+            toff |= offcard
+            if offcard & rival_knowns:
+                rival_knowns ^= offcard
+            else:
+                blackset ^= offcard
+                rival_num_unknowns -= 1
+
+            moves = list(iterate(beaters(cards, offcard))) + [None]
+            defcard = decide(moves, DEFEND, toff, tdef, offcard)
+            send(defcard)
+            if defcard is None:
+                unb = yield rc.UNBEATABLES
+                toff |= unb
+                cards |= toff | tdef
+                my_knowns |= toff | tdef
+                rival_knowns &= ~unb
+                rival_num_unknowns -= size(blackset & unb)
+                blackset &= ~unb
+                return False
+
+            cards ^= defcard
+            my_knowns &= ~defcard
+            tdef |= defcard
+
+        return True
+
+    while not is_eog():
+        iattack = (yield from offense()) if iattack else (yield from defense())
+        my_replenishment = yield rc.REPLENISHMENT
+        blackset &= ~my_replenishment
+        cards |= my_replenishment
+        rival_num_unknowns += yield rc.NUM_RIVAL_REPLENISHMENT
+        if blackset and rival_num_unknowns == size(blackset):
+            rival_knowns |= blackset
+            blackset = 0
+            yield from smartest.decision_scenario(send, cards, rival_knowns, iattack)
+            break
+
+    yield rc.GAME_OVER
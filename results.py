@@ -0,0 +1,114 @@
+"""Running tallies of game results, confidence intervals and stopping rules.
+
+The score of the 1st player is the share of decisive games it won, as in res.txt:
+draws are not counted.
+"""
+
+import json
+import math
+from collections import Counter
+
+
+# Normal quantiles for common confidence levels
+Z_SCORES = {0.9: 1.645, 0.95: 1.96, 0.99: 2.576, 0.999: 3.291}
+
+
+def wilson_interval(wins, n, z):
+    """Wilson score interval for the probability of a win, given wins out of n"""
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class Tally:
+    """Counts of wins, draws and losses of the 1st player, updated as games come in"""
+
+    def __init__(self):
+        self.results = Counter()
+
+    def update(self, results):
+        """Add a Counter of `game.rungame' results"""
+        self.results.update(results)
+
+    @property
+    def wins(self):
+        return self.results[True]
+
+    @property
+    def draws(self):
+        return self.results[None]
+
+    @property
+    def losses(self):
+        return self.results[False]
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    @property
+    def decisive(self):
+        return self.wins + self.losses
+
+    def score(self):
+        return self.wins / self.decisive if self.decisive else 0.5
+
+    def interval(self, z):
+        return wilson_interval(self.wins, self.decisive, z)
+
+    def summary(self, z):
+        low, high = self.interval(z)
+        return "{} {} {}; {:.2%} / {:.2%} (score in [{:.2%}, {:.2%}])".format(
+            self.wins, self.draws, self.losses, self.score(), 1 - self.score(), low, high
+        )
+
+    def record(self, z, **extra):
+        """Dict for a results file"""
+        low, high = self.interval(z)
+        return dict(
+            extra,
+            wins=self.wins, draws=self.draws, losses=self.losses,
+            score=self.score(), low=low, high=high,
+        )
+
+
+class StoppingRule:
+    """When to stop a run early
+
+    A run stops when the confidence interval of the score is no wider than
+    2 * precision, or when it does not contain 0.5 (one player is clearly better).
+    Nothing is decided before min_games.  Checking after every chunk of games makes
+    the real confidence somewhat lower than the nominal one, so prefer high levels.
+    """
+
+    def __init__(self, precision=None, separate=True, confidence=0.99, min_games=100):
+        self.precision = precision
+        self.separate = separate
+        self.z = Z_SCORES[confidence]
+        self.min_games = min_games
+
+    def reason_to_stop(self, tally):
+        """Return the reason to stop (str), or None to go on"""
+        if tally.games < self.min_games:
+            return None
+        low, high = tally.interval(self.z)
+        if self.precision is not None and (high - low) / 2 <= self.precision:
+            return 'precision'
+        if self.separate and (high < 0.5 or low > 0.5):
+            return 'separated'
+        return None
+
+
+def append_record(path, record):
+    """Append record (dict) to the results file: 1 JSON object per line"""
+    with open(path, 'a') as file:
+        file.write(json.dumps(record) + '\n')
+
+
+def read_records(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
@@ -0,0 +1,143 @@
+"""Statistics of decision tree searches.
+
+Set `decision_tree.stats' to a SearchStats to collect them.  The functions of the
+decision tree (see `decision_tree.cache_results_in') are then counting nodes and cache
+lookups; when it is None, they are built without any counting, so nothing is spent on
+it.  A decision is what `smartest' searches to make a move, from `start_decision' to
+`end_decision'.
+"""
+
+import heapq
+import time
+from collections import Counter
+
+
+# Number of the slowest decisions to keep
+KEEP_SLOWEST = 10
+
+
+class SearchStats:
+    """Counts of a number of searches
+
+    nodes: {(function name, levels): nodes expanded}, i.e. calls that were not found in
+    the cache.  levels is the depth left, so this is also a depth histogram.  Nodes of
+    exact solving (see `endgame') are under ('endgame', 0).
+    hits, misses: {function name: cache lookups}
+    fanout: {number of unbeatables sets searched at an i_put_unbeatables node: nodes},
+    counted by `decision_tree' itself: distinct sets only, none after a cutoff
+    decisions, seconds: {decision function: number of decisions, their wall time}
+    decision_nodes: {n: decisions that expanded from 2^(n-1) to 2^n - 1 nodes}
+    slowest: [(seconds, decision function, nodes, position)], the slowest decisions
+    """
+
+    def __init__(self):
+        self.nodes = Counter()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.fanout = Counter()
+        self.decisions = Counter()
+        self.seconds = Counter()
+        self.decision_nodes = Counter()
+        self.slowest = []
+        self._start = None
+
+    def total_nodes(self):
+        return sum(self.nodes.values())
+
+    def start_decision(self):
+        self._start = time.perf_counter(), self.total_nodes()
+
+    def end_decision(self, fn, position):
+        start, nodes = self._start
+        seconds = time.perf_counter() - start
+        nodes = self.total_nodes() - nodes
+        self.decisions[fn] += 1
+        self.seconds[fn] += seconds
+        self.decision_nodes[nodes.bit_length()] += 1
+        self._keep_slowest([(seconds, fn, nodes, position)])
+
+    def count_endgame(self, budget):
+        """Count the nodes spent of the `alphabeta.Budget' of an `endgame' decision"""
+        if budget.nodes_left is not None:
+            self.nodes['endgame', 0] += min(budget.nodes, budget.nodes - budget.nodes_left)
+
+    def _keep_slowest(self, decisions):
+        self.slowest = heapq.nlargest(KEEP_SLOWEST, self.slowest + decisions)
+
+    def counting(self, fn, name, levels):
+        """fn that counts its calls as nodes"""
+        nodes = self.nodes
+        key = name, levels
+
+        def counted(*position):
+            nodes[key] += 1
+            return fn(*position)
+
+        return counted
+
+    def lookups(self, mapping, name):
+        """mapping that counts hits and misses of its `get'"""
+        return _CountingMapping(mapping, name, self.hits, self.misses)
+
+    def update(self, other):
+        """Add the counts of another SearchStats (e.g. of a worker process)"""
+        for attr in ('nodes', 'hits', 'misses', 'fanout', 'decisions', 'seconds',
+                     'decision_nodes'):
+            getattr(self, attr).update(getattr(other, attr))
+        self._keep_slowest(other.slowest)
+
+    def report(self):
+        lines = ["Decisions:"]
+        for fn, n in sorted(self.decisions.items()):
+            lines.append("  {}: {}, {:.3f}s total, {:.2f}ms mean".format(
+                fn, n, self.seconds[fn], self.seconds[fn] / n * 1000
+            ))
+
+        lines.append("Nodes per decision:")
+        for n, count in sorted(self.decision_nodes.items()):
+            lines.append("  {}-{}: {}".format(2 ** n >> 1, 2 ** n - 1, count))
+
+        lines.append("Nodes by function and levels left:")
+        for (name, levels), n in sorted(self.nodes.items()):
+            lines.append("  {} {}: {}".format(name, levels, n))
+
+        lines.append("Cache lookups:")
+        for name in sorted(set(self.hits) | set(self.misses)):
+            hits, misses = self.hits[name], self.misses[name]
+            lines.append("  {}: {} hits, {} misses ({:.1%} hit rate)".format(
+                name, hits, misses, hits / (hits + misses)
+            ))
+
+        lines.append("Unbeatables sets per i_put_unbeatables node:")
+        for n, count in sorted(self.fanout.items()):
+            lines.append("  {}: {}".format(n, count))
+
+        lines.append("Slowest decisions:")
+        for seconds, fn, nodes, position in self.slowest:
+            lines.append("  {:.3f}s {} {} nodes, position {}".format(
+                seconds, fn, nodes, tuple(map(hex, position))
+            ))
+
+        return '\n'.join(lines)
+
+
+class _CountingMapping:
+    __slots__ = 'mapping', 'name', 'hits', 'misses'
+
+    def __init__(self, mapping, name, hits, misses):
+        self.mapping = mapping
+        self.name = name
+        self.hits = hits
+        self.misses = misses
+
+    def get(self, key, default=None):
+        value = self.mapping.get(key)
+        if value is None:
+            self.misses[self.name] += 1
+            return default
+        self.hits[self.name] += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self.mapping[key] = value
+
@@ -1,76 +1,111 @@
+from functools import partial
+
+import decision_tree
+import endgame
+from alphabeta import Budget, BudgetExhausted, make_decision, deepening_decision
 from common import RequestCode as rc
-from decision_tree import make_decision
 from smart import scenario as smart_scenario
 
 
-def scenario(send, cards, iattack):
-    return smart_scenario(send, cards, iattack, decision_scenario)
+def scenario(send, cards, iattack, budget=None, levels=None):
+    """Smart scenario with decision tree search in the open game
+
+    :param budget: if given, `alphabeta.Budget' per move.  The search is then deepened
+    while the budget lasts, instead of searching a fixed number of levels deep.
+    :param levels: depth of the search, MAX_LEVELS by default
+    """
+    return smart_scenario(
+        send, cards, iattack, partial(decision_scenario, budget=budget, levels=levels)
+    )
 
 
 MAX_LEVELS = 2
 
+# Open positions of up to ENDGAME_CARDS cards are solved exactly (see `endgame'), if
+# that takes no more than ENDGAME_NODES nodes.  0 to never solve.
+ENDGAME_CARDS = 8
+ENDGAME_NODES = endgame.MAX_NODES
+
+
+def decision_scenario(send, mycards, hiscards, iattack, budget=None, levels=None):
+    if levels is None:
+        levels = MAX_LEVELS
+
+    def decide(fn, *position):
+        """Return (estimate, bestmove)"""
+        stats = decision_tree.stats
+        if stats is None:
+            return solve_or_search(fn, position)
+        stats.start_decision()
+        try:
+            return solve_or_search(fn, position)
+        finally:
+            stats.end_decision(fn, position)
+
+    def solve_or_search(fn, position):
+        if endgame.can_solve(position, ENDGAME_CARDS):
+            solver_budget = Budget(nodes=ENDGAME_NODES)
+            try:
+                return endgame.decision(fn, position, solver_budget)
+            except BudgetExhausted:
+                pass
+            finally:
+                if decision_tree.stats is not None:
+                    decision_tree.stats.count_endgame(solver_budget)
+        return search(fn, position)
+
+    def search(fn, position):
+        if budget is None:
+            return make_decision(levels, fn)(*position)
+        else:
+            est, move, depth = deepening_decision(fn, position, budget)
+            return est, move
 
-def decision_scenario(send, mycards, hiscards, iattack):
     def offense():
-        """Conduct our offense. Params are mutable sets"""
-        toff, tdef = set(), set()
+        """Conduct our offense"""
+        nonlocal mycards, hiscards
+
+        toff, tdef = 0, 0
         while mycards and hiscards:
-            fn = make_decision(MAX_LEVELS, 'i_attack')
-            est, offcard = fn(
-                frozenset(mycards),
-                frozenset(hiscards),
-                frozenset(toff),
-                frozenset(tdef)
-            )
+            est, offcard = decide('i_attack', mycards, hiscards, toff, tdef)
             send(offcard)
             if offcard is None:
                 return False
-            mycards.remove(offcard)
-            toff.add(offcard)
+            mycards ^= offcard
+            toff |= offcard
 
             defcard = yield rc.DEFCARD
             if defcard is None:
-                fn = make_decision(MAX_LEVELS, 'i_put_unbeatables')
-                est, unb = fn(
-                    frozenset(mycards),
-                    frozenset(hiscards),
-                    frozenset(toff),
-                    frozenset(tdef)
-                )
+                est, unb = decide('i_put_unbeatables', mycards, hiscards, toff, tdef)
                 send(unb)
-                mycards.difference_update(unb)
-                hiscards.update(unb, toff, tdef)
+                mycards &= ~unb
+                hiscards |= unb | toff | tdef
                 return True
-            hiscards.remove(defcard)
-            tdef.add(defcard)
+            hiscards ^= defcard
+            tdef |= defcard
 
     def defense():
-        """Conduct our defense. Params are mutable sets"""
-        toff, tdef = set(), set()
+        """Conduct our defense"""
+        nonlocal mycards, hiscards
+
+        toff, tdef = 0, 0
         while mycards and hiscards:
             offcard = yield rc.OFFCARD
             if offcard is None:
                 return True
-            hiscards.remove(offcard)
-            toff.add(offcard)
-
-            fn = make_decision(MAX_LEVELS, 'i_defend')
-            est, defcard = fn(
-                frozenset(hiscards),
-                frozenset(mycards),
-                frozenset(toff),
-                frozenset(tdef),
-                offcard
-            )
+            hiscards ^= offcard
+            toff |= offcard
+
+            est, defcard = decide('i_defend', hiscards, mycards, toff, tdef, offcard)
             send(defcard)
             if defcard is None:
                 unb = yield rc.UNBEATABLES
-                hiscards.difference_update(unb)
-                mycards.update(unb, toff, tdef)
+                hiscards &= ~unb
+                mycards |= unb | toff | tdef
                 return False
 
-            mycards.remove(defcard)
-            tdef.add(defcard)
+            mycards ^= defcard
+            tdef |= defcard
 
     while mycards and hiscards:
         iattack = (yield from offense()) if iattack else (yield from defense())
@@ -0,0 +1,129 @@
+"""Tablebase of solved open positions.
+
+The tablebase holds the exact value (see `endgame') and the best first attack of every
+open position at the start of a strike with up to K cards per player.  Card sets are
+trump-relative (see `cardset'), so one tablebase serves all trumps.
+
+Every position has its own byte, at the index given by `rank': a perfect hash of
+(c_off, c_def).  The byte is the value code (LOSS, DRAW, WIN = 0, 1, 2) in the high 2
+bits and the index of the best card + 1 in the low 6 bits.  At runtime the file is
+memory-mapped, so processes forked after opening it share its pages.
+
+Generate with:
+
+    python tablebase.py FILE -K 2
+
+K=2 is about 400 thousand positions, K=3 about 50 million.
+"""
+
+import mmap
+import os
+import struct
+import time
+from argparse import ArgumentParser
+from itertools import combinations
+from math import comb
+
+import endgame
+from alphabeta import Budget
+from cardset import CARDS, NUM_CARDS, index_of, iterate, size
+
+
+MAGIC = b'DURAKTB1'
+HEADER = struct.Struct('<8sII')  # magic, K, number of positions
+
+VALUE_CODES = {endgame.LOSS: 0, endgame.DRAW: 1, endgame.WIN: 2}
+VALUES = {code: value for value, code in VALUE_CODES.items()}
+
+
+def _offsets(K):
+    """{(size of c_off, size of c_def): index of the first such position}"""
+    offsets, index = {}, 0
+    for a in range(1, K + 1):
+        for b in range(1, K + 1):
+            offsets[a, b] = index
+            index += comb(NUM_CARDS, a) * comb(NUM_CARDS - a, b)
+    return offsets, index
+
+
+def _rank_combination(indices):
+    """Colex rank of a combination given as increasing indices"""
+    return sum(comb(x, i + 1) for i, x in enumerate(indices))
+
+
+def rank(c_off, c_def, offsets):
+    """Index of the position in the tablebase"""
+    off = [index_of(c) for c in iterate(c_off)]
+    # Cards of c_def are numbered among the cards not in c_off
+    dfn = [x - sum(1 for y in off if y < x) for x in map(index_of, iterate(c_def))]
+    a, b = len(off), len(dfn)
+    return offsets[a, b] + \
+        _rank_combination(off) * comb(NUM_CARDS - a, b) + _rank_combination(dfn)
+
+
+class Tablebase:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, self.K, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError("Not a tablebase: {}".format(path))
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets, total = _offsets(self.K)
+        if count != total or len(self.data) != HEADER.size + count:
+            raise ValueError("Tablebase is damaged: {}".format(path))
+
+    def close(self):
+        self.data.close()
+
+    def covers(self, c_off, c_def):
+        return 0 < size(c_off) <= self.K and 0 < size(c_def) <= self.K
+
+    def probe(self, c_off, c_def):
+        """Return (value for the attacker, best card), or None if not in the tablebase"""
+        if not self.covers(c_off, c_def):
+            return None
+        byte = self.data[HEADER.size + rank(c_off, c_def, self.offsets)]
+        return VALUES[byte >> 6], CARDS[(byte & 0x3f) - 1]
+
+
+def positions(K):
+    """Yield all the positions (c_off, c_def) of a tablebase"""
+    for a in range(1, K + 1):
+        for b in range(1, K + 1):
+            for off in combinations(CARDS, a):
+                c_off = sum(off)
+                rest = [c for c in CARDS if not c & c_off]
+                for dfn in combinations(rest, b):
+                    yield c_off, sum(dfn)
+
+
+def generate(path, K, progress=None):
+    """Solve all the positions with up to K cards per player, write the tablebase"""
+    offsets, count = _offsets(K)
+    data = bytearray(count)
+    for i, (c_off, c_def) in enumerate(positions(K)):
+        value, card = endgame.decision('i_attack', (c_off, c_def, 0, 0), Budget())
+        data[rank(c_off, c_def, offsets)] = VALUE_CODES[value] << 6 | (index_of(card) + 1)
+        if progress and (i + 1) % progress == 0:
+            print(i + 1, "of", count, "solved")
+
+    tmppath = path + '.tmp'
+    with open(tmppath, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, K, count))
+        f.write(data)
+    os.replace(tmppath, path)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('path')
+    parser.add_argument('-K', type=int, default=2, help="max number of cards per player")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generate(args.path, args.K, progress=100000)
+    print("Generated in {:.0f}s".format(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
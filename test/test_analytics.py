@@ -0,0 +1,81 @@
+from collections import Counter
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import analytics
+import smart
+from common import game_random, mean_cardvalue, game_context
+from game import rungame, new_game
+from gamelog import GameLogWriter, Recorder, DEFENCE, RECORD, DEAL_SIZE
+
+
+N = 30
+
+
+@pytest.fixture(scope='module')
+def records():
+    records = []
+    results = [
+        rungame(smart.scenario, smart.scenario, game_random(6, i),
+                recorder=Recorder(records.append, 6, i))
+        for i in range(N)
+    ]
+    return records, results
+
+
+def test_load(records, tmp_path):
+    records, results = records
+    path = str(tmp_path / 'games.log')
+    with GameLogWriter(path) as log:
+        for record in records:
+            log.write(record)
+
+    games = analytics.load(path)
+    expected = analytics.from_records(records)
+    for field in ('seed', 'number', 'trump', 'result', 'deal', 'nevents'):
+        assert np.array_equal(getattr(games, field), getattr(expected, field))
+    assert list(games.number) == list(range(N))
+
+
+def test_deal_features(records):
+    records, results = records
+    games = analytics.from_records(records)
+
+    for i, (trumps, strength) in enumerate(zip(analytics.trump_count(games),
+                                               analytics.mean_strength(games))):
+        state = new_game(game_random(6, i))
+        hand = game_context(state.trump).encoding.to_cards(state.deal[0])
+        assert trumps == sum(suit == state.trump for suit, value in hand)
+        assert strength == pytest.approx(mean_cardvalue(hand, state.trump))
+
+    groups = analytics.win_rates(games, np.zeros(N, int))
+    tally = Counter(results)
+    assert (groups.games[0], groups.wins[0], groups.draws[0], groups.losses[0]) == \
+        (N, tally[True], tally[None], tally[False])
+    assert groups.games.sum() == \
+        analytics.win_rates(games, analytics.trump_count(games)).games.sum() == N
+
+
+def test_replay(records):
+    records, results = records
+    games = analytics.from_records(records)
+
+    hands = analytics.final_hands(games)
+    for result, hand0, hand1 in zip(results, *hands):
+        assert (result, bool(hand0), bool(hand1)) in \
+            [(None, False, False), (True, False, True), (False, True, False)]
+
+    defences = analytics.defences(games)
+    assert list(np.bincount(defences.game, minlength=N)) == [
+        sum(byte >> 6 == DEFENCE for byte in record[RECORD.size + DEAL_SIZE:])
+        for record in records
+    ]
+    assert defences.beatable[defences.defcard >= 0].all()
+
+
+def test_no_games():
+    games = analytics.from_records([])
+    assert analytics.final_hands(games).shape == (2, 0)
+    assert len(analytics.defences(games).game) == 0
@@ -0,0 +1,34 @@
+import random
+
+import batch
+import dumb
+import smart
+from game import rungame
+
+
+def test_same_results_as_rungame():
+    scenarios = {'dumb': dumb.scenario, 'smart': smart.scenario}
+    for name1 in scenarios:
+        for name2 in scenarios:
+            random.seed(1)
+            expected = [rungame(scenarios[name1], scenarios[name2]) for i in range(200)]
+            random.seed(1)
+            decks, trumps = batch.deal(200)
+            assert len(decks) == 200 * 36 and len(trumps) == 200
+            assert batch.play_batch(
+                decks, batch.POLICIES[name1], batch.POLICIES[name2]
+            ) == expected
+
+
+def test_playout_with_move():
+    random.seed(2)
+    decks, trumps = batch.deal(50)
+    for i in range(0, len(decks), 36):
+        deck = [batch.CARDS[j] for j in decks[i:i + 36]]
+        hand = sum(deck[:6])
+        expected = batch.play(deck, batch.SMART, batch.DUMB)
+        hands = [hand, sum(deck[6:12])]
+        move = batch.SMART.attack(hand, 0, 0, 6, batch.FULL & ~hand)
+        assert batch.playout(
+            (batch.SMART, batch.DUMB), hands, deck, 12, 0, [0, 0], 0, move=move
+        ) == expected
@@ -0,0 +1,71 @@
+"""Throughput of the solvers on a fixed set of positions.
+
+Each benchmark fails if the solver handles fewer positions per second than its
+MIN_RATE, which is set well below what an ordinary machine does.  To catch smaller
+slowdowns, save a run and compare later ones to it:
+
+    pytest test/test_benchmarks.py --benchmark-autosave
+    pytest test/test_benchmarks.py --benchmark-compare --benchmark-compare-fail=mean:10%
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import alphabeta
+import decision_tree
+import endgame
+from cardset import CARDS
+from transposition import TranspositionTable
+
+
+def fixed_positions(n, max_cards, seed=0):
+    rnd = random.Random(seed)
+    positions = []
+    for i in range(n):
+        cards = rnd.sample(CARDS, rnd.randint(4, max_cards))
+        k = rnd.randint(1, len(cards) - 1)
+        positions.append((sum(cards[:k]), sum(cards[k:]), 0, 0))
+    return positions
+
+
+SEARCH_POSITIONS = fixed_positions(200, 12)
+ENDGAME_POSITIONS = fixed_positions(50, 8, seed=1)
+
+# Positions per second
+MIN_RATE = {
+    'decision_tree': 300,
+    'alphabeta': 600,
+    'endgame': 40,
+}
+
+
+def check_rate(benchmark, name, n):
+    rate = n / benchmark.stats.stats.mean
+    assert rate >= MIN_RATE[name], "{}: {:.0f} positions/s".format(name, rate)
+
+
+@pytest.mark.parametrize('engine', [decision_tree, alphabeta], ids=lambda e: e.__name__)
+def test_search(benchmark, engine):
+    def solve():
+        return [engine.make_decision(2, 'i_attack')(*p) for p in SEARCH_POSITIONS]
+
+    assert benchmark(solve) == [
+        decision_tree.make_decision(2, 'i_attack')(*p) for p in SEARCH_POSITIONS
+    ]
+    check_rate(benchmark, engine.__name__, len(SEARCH_POSITIONS))
+
+
+def test_endgame(benchmark, monkeypatch):
+    def reset():
+        monkeypatch.setattr(endgame, 'solved', TranspositionTable())
+
+    def solve():
+        return [
+            endgame.decision('i_attack', p, alphabeta.Budget()) for p in ENDGAME_POSITIONS
+        ]
+
+    benchmark.pedantic(solve, setup=reset, rounds=5)
+    check_rate(benchmark, 'endgame', len(ENDGAME_POSITIONS))
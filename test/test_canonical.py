@@ -0,0 +1,46 @@
+import random
+
+from canonical import canonical, restore, unpack
+from cardset import CARDS, NUM_SLOTS, TRUMPS, FIRST_TRUMP_BIT, iterate
+
+
+def permute_suits(cards, perm):
+    """Move the non-trump cards of slot s to slot perm[s]"""
+    res = cards & TRUMPS
+    for card in iterate(cards & ~TRUMPS):
+        i = card.bit_length() - 1
+        res |= 1 << (i - i % NUM_SLOTS + perm[i % NUM_SLOTS])
+    return res
+
+
+def random_position(rnd):
+    cards = rnd.sample(CARDS, rnd.randint(2, 12))
+    a, b = sorted(rnd.sample(range(1, len(cards)), 2)) if len(cards) > 2 else (1, 2)
+    return sum(cards[:a]), sum(cards[a:b]), sum(cards[b:]), 0
+
+
+def test_suit_permutations():
+    rnd = random.Random(0)
+    perms = [(0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0)]
+    for i in range(2000):
+        position = random_position(rnd)
+        packed, transform = canonical(position)
+        for perm in perms:
+            permuted = tuple(permute_suits(x, perm) for x in position)
+            assert canonical(permuted)[0] == packed
+
+
+def test_restore():
+    rnd = random.Random(1)
+    for i in range(2000):
+        position = random_position(rnd)
+        packed, transform = canonical(position)
+        assert tuple(restore(transform, x) for x in unpack(packed, 4)) == position
+
+
+def test_equal_suits():
+    # Suits with the same signature keep their order
+    position = (CARDS[0] | CARDS[1], 0, 1 << FIRST_TRUMP_BIT, 0)
+    packed, (moves, order) = canonical(position)
+    assert order == (2, 0, 1)
+    assert tuple(restore((moves, order), x) for x in unpack(packed, 4)) == position
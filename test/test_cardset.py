@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+import cardset
+import common
+from common import Card, SUITS, deckset, encoding
+
+
+@pytest.fixture(params=SUITS)
+def trump(request):
+    return request.param
+
+
+def test_strength_order(trump):
+    enc = encoding(trump)
+    cards = sorted(deckset, key=lambda c: enc.card(c))
+    values = [common.card_value(c, trump) for c in cards]
+    assert values == sorted(values)
+    assert [cardset.VALUE[enc.card(c)] for c in cards] == values
+
+
+def test_beats(trump):
+    enc = encoding(trump)
+    for c1 in deckset:
+        for c2 in deckset:
+            assert cardset.beats(enc.card(c1), enc.card(c2)) == \
+                common.beats(c1, c2, trump)
+
+
+def test_matching_and_mean(trump, monkeypatch):
+    monkeypatch.setattr(common.gcxt, 'trump', trump)
+    enc = encoding(trump)
+    rnd = random.Random(trump)
+    deck = sorted(deckset)
+    for _ in range(500):
+        cards = frozenset(rnd.sample(deck, rnd.randint(1, 12)))
+        table = frozenset(rnd.sample(sorted(deckset - cards), rnd.randint(1, 6)))
+        assert enc.to_cards(cardset.matching(enc.cards(cards), enc.cards(table))) == \
+            common.matching_by_value(cards, common.values_of(table))
+        assert cardset.mean_value(enc.cards(cards)) == common.mean_cardvalue(cards)
+
+
+def test_iterate_and_split():
+    cards = cardset.make_card(0, 9) | cardset.make_card(None, 6) | cardset.make_card(2, 7)
+    assert cardset.size(cards) == 3
+    assert cardset.split(cards) == [
+        cardset.make_card(2, 7), cardset.make_card(0, 9), cardset.make_card(None, 6)
+    ]
+    assert cardset.weakest(cards) == cardset.make_card(2, 7)
+    assert cardset.strongest(cards) == cardset.make_card(None, 6)
+    assert cardset.weakest_n(cards, 2) == cards & ~cardset.make_card(None, 6)
+
+
+def test_encoding_roundtrip(trump):
+    enc = encoding(trump)
+    assert enc.cards(deckset) == cardset.FULL
+    assert enc.to_cards(cardset.FULL) == deckset
+    assert enc.to_card(cardset.make_card(None, 14)) == Card(trump, 14)
+    assert enc.native(Card(trump, 6)) == cardset.make_card(None, 6)
+    assert enc.native(None) is None
+
+
+def test_context_tables(trump):
+    context = common.game_context(trump)
+    for c1 in deckset:
+        assert context.card_value(c1) == common._card_value(c1, trump)
+        for c2 in deckset:
+            expected = common._beats(c1, c2, trump)
+            assert context.beats(c1, c2) == expected
@@ -1,99 +1,135 @@
+import random
+
 import pytest
 
-import gcxt
+import alphabeta
 import decision_tree
-from decision_tree import build_tree, cardset_relation, node_estimate
-from common import Card
-
-
-@pytest.fixture(scope='function')
-def set_trump(monkeypatch):
-    return lambda trump: monkeypatch.setattr(gcxt, 'trump', trump)
-
-
-def test_i_put_rival_wins(set_trump):
-    set_trump('hearts')
-    node = build_tree([Card('clubs', 10), Card('diamonds', 8)],
-                      [Card('hearts', 6)],
-                      True)
-    assert node_estimate(node) == 0.0
-
-
-def test_i_put_result_draw(set_trump):
-    set_trump('hearts')
-    node = build_tree([Card('clubs', 10)],
-                      [Card('clubs', 11)],
-                      True)
-    assert node_estimate(node) == 0.5
-    node = build_tree([Card('clubs', 14)],
-                      [Card('hearts', 6)],
-                      True)
-    assert node_estimate(node) == 0.5
-
-
-def test_i_put_i_win(set_trump, monkeypatch):
-    set_trump('hearts')
-    monkeypatch.setattr(decision_tree, 'MAXDEPTH', 4)
-    node = build_tree([Card('clubs', 10)],
-                      [Card('clubs', 9)],
-                      True)
-    assert node_estimate(node) == 1.0
-    node = build_tree([Card('clubs', 6), Card('clubs', 8), Card('clubs', 9),
-                       Card('hearts', 8)],
-                      [Card('clubs', 7)],
-                      True)
-    assert node_estimate(node) == 1.0
-
-
-def test_rival_puts_i_win(set_trump):
-    set_trump('hearts')
-    node = build_tree([Card('clubs', 10)],
-                      [Card('clubs', 9), Card('clubs', 6)],
-                      False)
-    assert node_estimate(node) == 1.0
-
-
-def test_rival_puts_result_draw(set_trump):
-    set_trump('hearts')
-    node = build_tree([Card('clubs', 10)], [Card('clubs', 9)], False)
-    assert node_estimate(node) == 0.5
-
-
-def test_rival_puts_rival_wins(set_trump):
-    set_trump('hearts')
-    node = build_tree([Card('spades', 10)],
-                      [Card('clubs', 9)],
-                      False)
-    assert node_estimate(node) == 0.0
-    node = build_tree([Card('clubs', 6), Card('clubs', 8), Card('clubs', 9),
-                       Card('hearts', 8)],
-                      [Card('clubs', 7)],
-                      False)
-    assert node_estimate(node) == 0.0
-
-
-def test_cardset_relation(set_trump):
-    set_trump('spades')
-    p1, p2 = cardset_relation(
-        [Card('hearts', 10)],
-        [Card('hearts', 9)]
-    )
-    assert p1 == 1.0 and p2 == 0.0
-
-    p1, p2 = cardset_relation(
-        [Card('hearts', 14), Card('hearts', 12)],
-        [Card('diamonds', 8)]
-    )
-    assert p1 == 1.0 and p2 == 0.0
-
-    p1, p2 = cardset_relation(
-        [Card('hearts', 14), Card('hearts', 12)],
-        [Card('diamonds', 13), Card('diamonds', 11)]
-    )
-    assert p1 == 0.75 and p2 == 0.25
-
-    p1, p2 = cardset_relation(
-        [Card('hearts', 14), Card('hearts', 12)],
-        [Card('diamonds', 13)]
-    )
-    assert p1 == 0.5 and p2 == 0.5
+from cardset import CARDS
+from common import Card, encoding
+from decision_tree import make_decision, make_offense_decision, cardset_relation
+
+
+def cardset(trump, *cards):
+    enc = encoding(trump)
+    return sum(enc.card(Card(suit, value)) for suit, value in cards)
+
+
+def estimate(mycards, hiscards, iattack, levels=2):
+    """Our estimate of an open position at the start of a strike"""
+    mycards, hiscards = cardset('hearts', *mycards), cardset('hearts', *hiscards)
+    if iattack:
+        return make_offense_decision(levels, mycards, hiscards, True)[0]
+    else:
+        return make_offense_decision(levels, hiscards, mycards, False)[0]
+
+
+def test_i_put_rival_wins():
+    assert estimate([('clubs', 10), ('diamonds', 8)], [('hearts', 6)], True) == 0.0
+
+
+def test_i_put_result_draw():
+    assert estimate([('clubs', 10)], [('clubs', 11)], True) == 0.5
+    assert estimate([('clubs', 14)], [('hearts', 6)], True) == 0.5
+
+
+def test_i_put_i_win():
+    assert estimate([('clubs', 10)], [('clubs', 9)], True) == 1.0
+    assert estimate([('clubs', 6), ('clubs', 8), ('clubs', 9), ('hearts', 8)],
+                    [('clubs', 7)],
+                    True) == 1.0
+
+
+def test_rival_puts_i_win():
+    assert estimate([('clubs', 10)], [('clubs', 9), ('clubs', 6)], False) == 1.0
+
+
+def test_rival_puts_result_draw():
+    assert estimate([('clubs', 10)], [('clubs', 9)], False) == 0.5
+
+
+def test_rival_puts_rival_wins():
+    assert estimate([('spades', 10)], [('clubs', 9)], False) == 0.0
+    assert estimate([('clubs', 6), ('clubs', 8), ('clubs', 9), ('hearts', 8)],
+                    [('clubs', 7)],
+                    False) == 0.0
+
+
+def test_levels_horizon():
+    # Taking the last card of the rival ends the game in the next strike, which 1 level
+    # does not see
+    assert estimate([('clubs', 10)], [('clubs', 9)], True, levels=1) == 0.5
+
+
+def test_best_moves():
+    mycards = cardset('hearts', ('clubs', 6), ('clubs', 8), ('clubs', 9), ('hearts', 8))
+    hiscards = cardset('hearts', ('clubs', 7))
+    # The 6 of clubs would be beaten by his last card: the weakest winning card is 8
+    assert make_decision(2, 'i_attack')(mycards, hiscards, 0, 0) == \
+        (1.0, cardset('hearts', ('clubs', 8)))
+
+    # He attacks with the 7 of clubs: whatever we do, he is out of cards first
+    offcard = cardset('hearts', ('clubs', 7))
+    est, defcard = make_decision(2, 'i_defend')(0, mycards, offcard, 0, offcard)
+    assert est == 0.0
+
+
+def test_cardset_relation():
+    def relation(cards1, cards2):
+        return cardset_relation(cardset('spades', *cards1), cardset('spades', *cards2))
+
+    assert relation([('hearts', 10)], [('hearts', 9)]) == (1.0, 0.0)
+    assert relation([('hearts', 14), ('hearts', 12)], [('diamonds', 8)]) == (1.0, 0.0)
+    assert relation([('hearts', 14), ('hearts', 12)],
+                    [('diamonds', 13), ('diamonds', 11)]) == (0.75, 0.25)
+    assert relation([('hearts', 14), ('hearts', 12)], [('diamonds', 13)]) == (0.5, 0.5)
+
+
+def random_position(rnd, max_cards=12):
+    cards = rnd.sample(CARDS, rnd.randint(2, max_cards))
+    n = rnd.randint(1, len(cards) - 1)
+    return sum(cards[:n]), sum(cards[n:]), 0, 0
+
+
+@pytest.mark.parametrize('canonical_positions', [True, False])
+@pytest.mark.parametrize('fn', ['i_attack', 'rival_attacks'])
+def test_alphabeta_same_as_decision_tree(fn, canonical_positions, monkeypatch):
+    monkeypatch.setattr(decision_tree, 'canonical_positions', canonical_positions)
+    rnd = random.Random(fn)
+    for i in range(100):
+        position = random_position(rnd)
+        assert alphabeta.make_decision(2, fn)(*position) == \
+            make_decision(2, fn)(*position)
+
+
+def test_shared_table_same_results(monkeypatch):
+    rnd = random.Random(1)
+    positions = [random_position(rnd) for i in range(50)]
+    expected = [make_decision(2, 'i_attack')(*position) for position in positions]
+    monkeypatch.setattr(decision_tree, 'shared_table', {})
+    assert [make_decision(2, 'i_attack')(*position) for position in positions] == expected
+    # Now from the table
+    assert [make_decision(2, 'i_attack')(*position) for position in positions] == expected
+
+
+def test_unbeatables_variants(monkeypatch):
+    # Our 6s of clubs and diamonds are interchangeable: nobody has other clubs or
+    # diamonds.  The table is the 8 of spades (matching 6s) beaten by the 10 of spades.
+    mycards = cardset('hearts', ('clubs', 6), ('diamonds', 6), ('hearts', 14))
+    hiscards = cardset('hearts', ('hearts', 6), ('hearts', 7), ('spades', 11))
+    t_off = cardset('hearts', ('spades', 8))
+    t_def = cardset('hearts', ('spades', 10))
+    position = mycards, hiscards, t_off, t_def
+    sixes = cardset('hearts', ('clubs', 6), ('diamonds', 6))
+    club = cardset('hearts', ('clubs', 6))
+
+    assert list(decision_tree.unbeatables_variants(*position)) == [0, club, sixes]
+    assert list(decision_tree.unbeatables_variants(*position, distinct=False)) == \
+        [0, club, sixes ^ club, sixes]
+
+    expected = {}
+    for distinct in (False, True):
+        monkeypatch.setattr(decision_tree, 'distinct_unbeatables', distinct)
+        for levels in (1, 2, 3):
+            for engine in (decision_tree, alphabeta):
+                result = engine.make_decision(levels, 'i_put_unbeatables')(*position)
+                assert expected.setdefault(levels, result) == result
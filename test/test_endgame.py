@@ -0,0 +1,81 @@
+import random
+from functools import lru_cache
+from itertools import combinations
+
+import pytest
+
+import decision_tree
+import endgame
+import smart
+import smartest
+from alphabeta import Budget, BudgetExhausted
+from cardset import CARDS, iterate, matching, beaters, split, size
+from common import game_random
+from decision_tree import check_eog
+from game import rungame
+from searchstats import SearchStats
+
+
+@lru_cache(None)
+def attack(c_off, c_def, t_off, t_def):
+    res = check_eog(c_off, c_def, True)
+    if res is not None:
+        return res
+    values = [
+        defend(c_off ^ c, c_def, t_off | c, t_def, c)
+        for c in iterate(matching(c_off, t_off | t_def) if t_off else c_off)
+    ]
+    if t_off:
+        values.append(1.0 - attack(c_def, c_off, 0, 0))
+    return max(values)
+
+
+@lru_cache(None)
+def defend(c_off, c_def, t_off, t_def, offcard):
+    values = [attack(c_off, c_def ^ c, t_off, t_def | c) for c in iterate(beaters(c_def, offcard))]
+    suitable = split(matching(c_off, t_off | t_def))
+    values.append(max(
+        attack(c_off & ~unb, c_def | t_off | t_def | unb, 0, 0)
+        for n in range(min(len(suitable), size(c_def) - 1) + 1)
+        for unb in map(sum, combinations(suitable, n))
+    ))
+    return min(values)
+
+
+def random_positions(n, ncards, seed=0):
+    rnd = random.Random(seed)
+    for i in range(n):
+        cards = rnd.sample(CARDS, ncards)
+        k = rnd.randint(1, ncards - 1)
+        yield sum(cards[:k]), sum(cards[k:]), 0, 0
+
+
+def test_exact_values():
+    for position in random_positions(200, 6):
+        assert endgame.decision('i_attack', position, Budget())[0] == attack(*position)
+        values = endgame.move_values('i_attack', position)
+        assert max(values.values()) == attack(*position)
+
+
+def test_budget(monkeypatch):
+    monkeypatch.setattr(endgame, 'solved', endgame.TranspositionTable())
+    position = next(random_positions(1, 10, seed=3))
+    with pytest.raises(BudgetExhausted):
+        endgame.decision('i_attack', position, Budget(nodes=10))
+
+    monkeypatch.setattr(smartest, 'ENDGAME_CARDS', 12)
+    monkeypatch.setattr(smartest, 'ENDGAME_NODES', 10)
+    for i in range(5):
+        rungame(smartest.scenario, smart.scenario, game_random(0, i))
+
+
+def test_search_stats(monkeypatch):
+    monkeypatch.setattr(endgame, 'solved', endgame.TranspositionTable())
+    monkeypatch.setattr(smartest, 'MAX_LEVELS', 1)
+    monkeypatch.setattr(smartest, 'ENDGAME_CARDS', 36)
+    stats = SearchStats()
+    monkeypatch.setattr(decision_tree, 'stats', stats)
+    rungame(smartest.scenario, smart.scenario, game_random(0, 0))
+    # Every decision is tried with the solver first, within its budget
+    assert 0 < stats.nodes['endgame', 0] <= \
+        sum(stats.decisions.values()) * smartest.ENDGAME_NODES
@@ -0,0 +1,71 @@
+import random
+from array import array
+from itertools import combinations
+
+import pytest
+
+import batch
+import equity
+from cardset import CARDS, NUM_SLOTS, TRUMPS, NONTRUMPS, split
+from canonical import SLOT0
+from common import game_random
+from game import new_game
+
+
+def permute_suits(cards, permutation):
+    return (cards & TRUMPS) | sum(
+        ((cards >> slot) & SLOT0) << permutation[slot] for slot in range(NUM_SLOTS)
+    )
+
+
+def test_canonical_hand():
+    rnd = random.Random(0)
+    ranks = set()
+    for i in range(200):
+        hand = sum(rnd.sample(CARDS, 6))
+        canonical = equity.canonical_hand(hand)
+        assert equity.canonical_hand(canonical) == canonical
+        for permutation in ((1, 0, 2), (2, 1, 0), (1, 2, 0)):
+            assert equity.canonical_hand(permute_suits(hand, permutation)) == canonical
+        assert 0 <= equity.rank(canonical) < equity.NUM_HANDS
+        ranks.add((equity.rank(canonical), canonical))
+    assert len({rank for rank, hand in ranks}) == len(ranks)
+
+
+def test_rank_dense():
+    # Hands with 5 or 6 trumps take the last ranks
+    hands = [sum(trumps) for trumps in combinations(split(TRUMPS), 6)] + [
+        sum(trumps) | card
+        for trumps in combinations(split(TRUMPS), 5) for card in split(NONTRUMPS)
+    ]
+    ranks = {equity.rank(equity.canonical_hand(hand)) for hand in hands}
+    assert ranks == set(range(equity.NUM_HANDS - len(ranks), equity.NUM_HANDS))
+
+
+def test_generate(tmp_path):
+    path = str(tmp_path / 'equity')
+    equity.generate(path, 'smart', 100, seed=1, workers=1)
+    table = equity.EquityTable(path)
+    assert (table.scenario, table.games) == ('smart', 100)
+    counts = array('I')
+    counts.frombytes(table.data[equity.HEADER.size:])
+    assert sum(counts[0::4]) == sum(counts[2::4]) == 100
+
+    state = new_game(game_random(1, 7))
+    result = batch.rollout(state, batch.SMART, batch.SMART)
+    games, points = table.counts(state.deal[0], 0)
+    assert games >= 1 and points >= equity.score_points(result, 0)
+    assert 0 <= equity.expected_score(table, state) <= 1
+    table.close()
+
+    # Adding games
+    equity.generate(path, 'smart', 100, seed=2, workers=1)
+    table = equity.EquityTable(path)
+    assert table.games == 200
+    assert table.counts(state.deal[0], 0)[0] >= games
+    table.close()
+
+    with pytest.raises(ValueError):
+        equity.generate(path, 'dumb', 10, seed=3, workers=1)
+    with pytest.raises(ValueError):
+        equity.generate(str(tmp_path / 'other'), 'x' * 17, 10, seed=3, workers=1)
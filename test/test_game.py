@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import batch
+import gcxt
+import smart
+from common import game_random, game_context, card_value, Card
+from game import GameState, rungame, resume
+
+
+def play(i):
+    return rungame(smart.scenario, smart.scenario, game_random(2, i))
+
+
+def test_games_in_threads():
+    expected = list(map(play, range(40)))
+    with ThreadPoolExecutor(4) as exe:
+        assert list(exe.map(play, range(40))) == expected
+    assert gcxt.trump is None
+
+
+def test_compatibility_layer(monkeypatch):
+    monkeypatch.setattr(gcxt, 'trump', 'spades')
+    card = Card('spades', 6)
+    assert card_value(card) == game_context('spades').card_value(card) == 27
+    assert card_value(card, 'hearts') == 0
+
+
+@pytest.mark.parametrize('game', range(3))
+def test_snapshots(game):
+    states = []
+    result = rungame(smart.scenario, smart.scenario, game_random(5, game),
+                     on_strike=lambda state: states.append(state.clone()))
+    assert len(states) > 2
+    assert states[0].history == [[], []] and len(states[0].deck) == 24
+
+    for state in states:
+        copy = GameState.loads(state.dumps())
+        assert copy == state
+        assert resume(copy, smart.scenario, smart.scenario) == result
+        assert copy == state
+        # The batch policies make the same decisions as the scenarios
+        assert batch.rollout(state, batch.SMART, batch.SMART) == result
+
+
+def test_clone():
+    state = GameState('hearts', (1, 2), deck=[4, 8])
+    clone = state.clone()
+    clone.hands[0] = 0
+    clone.deck.pop()
+    clone.history[0].append(None)
+    assert state.hands == [1, 2] and state.deck == [4, 8] and state.history == [[], []]
@@ -0,0 +1,94 @@
+import smart
+from cardset import CARDS, size, union
+from common import NCARDS_PLAYER, game_random
+from game import rungame, new_game
+from gamelog import GameLogWriter, GameLog, scan, decode_events,\
+    OFFENCE, DEFENCE, UNBEATABLE, REPLENISHMENT
+
+
+def write_games(path, n, block_size=100):
+    results = []
+    with GameLogWriter(path, block_size) as log:
+        for i in range(n):
+            results.append(rungame(smart.scenario, smart.scenario, game_random(3, i),
+                                   recorder=log.recorder(3, i)))
+    return results
+
+
+def replay(game):
+    """Play the events of a logged game, return its result as `rungame' does"""
+    deal = [CARDS[i] for i in game.deal]
+    deck = deal[2 * NCARDS_PLAYER:]
+    hands = [union(deal[:NCARDS_PLAYER]), union(deal[NCARDS_PLAYER:2 * NCARDS_PLAYER])]
+    att, table, survived, replenished = 0, 0, True, []
+
+    for kind, card in decode_events(game.events):
+        if kind == REPLENISHMENT:
+            if card is None:
+                # The attacker's cards, then the defender's
+                i = att if not replenished else 1 - att
+                n = min(len(deck), max(0, NCARDS_PLAYER - size(hands[i])))
+                hands[i] |= union(deck[:n])
+                replenished.append(deck[:n])
+                del deck[:n]
+            else:
+                replenished[-1].remove(card)
+            continue
+        if replenished:
+            # A new strike
+            assert len(replenished) == 2 and replenished == [[], []]
+            if survived:
+                att = 1 - att
+            table, survived, replenished = 0, True, []
+        if kind == OFFENCE:
+            if card is not None:
+                hands[att] ^= card
+                table |= card
+        elif kind == DEFENCE:
+            if card is None:
+                survived = False
+                hands[1 - att] |= table
+            else:
+                hands[1 - att] ^= card
+                table |= card
+        elif kind == UNBEATABLE:
+            hands[att] ^= card
+            hands[1 - att] |= card
+
+    if not hands[0] and not hands[1]:
+        return None
+    assert not hands[0] or not hands[1]
+    return not hands[0]
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / 'games.log')
+    results = write_games(path, 10)
+    # Appending to an existing log
+    results += write_games(path, 2)
+
+    log = GameLog(path)
+    assert len(log) == 12
+    assert [game.result for game in log] == results
+    assert [game.number for game in log] == list(range(10)) + [0, 1]
+    assert log[3] == list(log)[3]
+    assert list(scan(path, buffer_size=64)) == list(log)
+
+    for i, game in enumerate(list(log)[:10]):
+        assert replay(game) == game.result
+        state = new_game(game_random(3, i))
+        assert game.trump == state.trump
+        assert [CARDS[c] for c in game.deal[2 * NCARDS_PLAYER:]] == state.deck
+        assert union(CARDS[c] for c in game.deal[:NCARDS_PLAYER]) == state.deal[0]
+    log.close()
+
+
+def test_negative_seed(tmp_path):
+    path = str(tmp_path / 'games.log')
+    with GameLogWriter(path) as log:
+        result = rungame(smart.scenario, smart.scenario, game_random(-3, 0),
+                         recorder=log.recorder(-3, 0))
+
+    log = GameLog(path)
+    assert [(game.seed, game.number, game.result) for game in log] == [(-3, 0, result)]
+    log.close()
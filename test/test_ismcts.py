@@ -0,0 +1,28 @@
+from functools import partial
+
+import ismcts
+import smart
+from common import game_random
+from game import rungame
+
+
+def test_tree():
+    tree = ismcts.Tree()
+    a = tree.child(0, 1)
+    assert tree.child(0, 1) == a == 1
+    assert tree.child(a, None) == 2
+    assert len(tree) == 3 and list(tree.visits) == [0, 0, 0]
+
+
+def test_plays_to_the_end():
+    scenario = partial(ismcts.scenario, iterations=5)
+    results = [rungame(scenario, smart.scenario, game_random(3, i)) for i in range(3)]
+    assert results == [rungame(scenario, smart.scenario, game_random(3, i)) for i in range(3)]
+    for i in range(3):
+        rungame(smart.scenario, scenario, game_random(3, i))
+
+
+def test_searches_open_game():
+    scenario = partial(ismcts.scenario, iterations=5, when_open_game=None)
+    for i in range(3):
+        assert rungame(scenario, smart.scenario, game_random(4, i)) in (True, False, None)
@@ -0,0 +1,45 @@
+import random
+from collections import Counter
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import batch
+import lockstep
+import smart
+from cardset import CARDS, matching, size, total_value, unbeatables
+from common import game_random
+from game import rungame
+from gamelog import RESULTS
+
+
+@pytest.mark.parametrize('name1', ['dumb', 'smart'])
+@pytest.mark.parametrize('name2', ['dumb', 'smart'])
+def test_same_results_as_batch(name1, name2):
+    random.seed(3)
+    decks, trumps = batch.deal(300)
+    expected = batch.play_batch(decks, batch.POLICIES[name1], batch.POLICIES[name2])
+    codes = lockstep.play(np.frombuffer(decks, np.uint8).reshape(300, 36),
+                          lockstep.POLICIES[name1], lockstep.POLICIES[name2])
+    assert [RESULTS[code] for code in codes] == expected
+
+
+def test_run_same_as_rungame():
+    expected = [rungame(smart.scenario, smart.scenario, game_random(4, i))
+                for i in range(10, 110)]
+    assert lockstep.run(100, lockstep.SMART, lockstep.SMART, 4, 10) == \
+        Counter(expected)
+
+
+def test_card_functions():
+    rnd = random.Random(0)
+    sets = [sum(rnd.sample(CARDS, rnd.randint(0, 12))) for i in range(200)]
+    tables = [sum(rnd.sample(CARDS, rnd.randint(0, 6))) for i in range(200)]
+    cards, table = np.array(sets, np.uint64), np.array(tables, np.uint64)
+    assert list(lockstep.size(cards)) == [size(c) for c in sets]
+    assert list(lockstep.total_value(cards)) == [total_value(c) for c in sets]
+    assert list(lockstep.matching(cards, table)) == \
+        [matching(c, t) for c, t in zip(sets, tables)]
+    assert list(lockstep.unbeatables(cards, table, np.full(200, 2))) == \
+        [unbeatables(c, t, 2) for c, t in zip(sets, tables)]
@@ -0,0 +1,11 @@
+from main import schedule
+
+
+def test_schedule_splits_exactly():
+    for first, N, workers in [(0, 1, 8), (5, 3, 8), (0, 100, 4), (10, 1001, 3)]:
+        chunks = list(schedule(first, N, workers))
+        assert all(n > 0 for start, n in chunks)
+        assert [start for start, n in chunks] == [
+            first + sum(n for start, n in chunks[:i]) for i in range(len(chunks))
+        ]
+        assert sum(n for start, n in chunks) == N
@@ -0,0 +1,14 @@
+from functools import partial
+
+import pimc
+import smart
+from common import game_random
+from game import rungame
+
+
+def test_plays_to_the_end():
+    scenario = partial(pimc.scenario, samples=2)
+    results = [rungame(scenario, smart.scenario, game_random(3, i)) for i in range(3)]
+    assert results == [rungame(scenario, smart.scenario, game_random(3, i)) for i in range(3)]
+    for i in range(3):
+        rungame(smart.scenario, scenario, game_random(3, i))
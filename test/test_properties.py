@@ -0,0 +1,134 @@
+"""Optimised searches give the same results as their reference versions"""
+
+import pytest
+
+hypothesis = pytest.importorskip('hypothesis')
+from hypothesis import given, settings, strategies as st
+
+import alphabeta
+import decision_tree
+import endgame
+from canonical import canonical, restore, unpack
+from cardset import CARDS, FULL, beaters, weakest
+from searchstats import SearchStats
+
+
+@st.composite
+def positions(draw, min_cards=2, max_cards=12, strike=False):
+    """Open position (c_off, c_def, 0, 0) at the start of a strike
+
+    If strike, possibly in the middle of one: up to 3 pairs of cards beaten on the table.
+    """
+    cards = draw(st.lists(st.sampled_from(CARDS), min_size=min_cards, max_size=max_cards,
+                          unique=True))
+    n = draw(st.integers(1, len(cards) - 1))
+    c_off, c_def = sum(cards[:n]), sum(cards[n:])
+    t_off = t_def = 0
+    if strike:
+        for offcard in draw(st.lists(st.sampled_from(CARDS), max_size=3, unique=True)):
+            free = FULL & ~(c_off | c_def | t_off | t_def)
+            defcard = weakest(beaters(free, offcard)) if offcard & free else 0
+            if defcard:
+                t_off |= offcard
+                t_def |= defcard
+    return c_off, c_def, t_off, t_def
+
+
+@st.composite
+def decisions(draw):
+    """(fn, position) of any decision of `decision_tree.make_decision'
+
+    i_defend and i_put_unbeatables are in the middle of a strike, after the rival's or
+    our weakest card is put on the table.
+    """
+    fn = draw(st.sampled_from(['i_attack', 'rival_attacks', 'i_defend',
+                               'i_put_unbeatables']))
+    c_off, c_def, t_off, t_def = draw(positions(strike=True))
+    if fn in ('i_attack', 'rival_attacks'):
+        return fn, (c_off, c_def, t_off, t_def)
+    offcard = weakest(c_off)
+    if fn == 'i_defend':
+        return fn, (c_off ^ offcard, c_def, t_off | offcard, t_def, offcard)
+    return fn, (c_off ^ offcard, c_def, t_off | offcard, t_def)
+
+
+def plain(search):
+    """Result of search() with no canonical positions and no shared table"""
+    saved = decision_tree.canonical_positions, decision_tree.shared_table
+    decision_tree.canonical_positions, decision_tree.shared_table = False, None
+    try:
+        return search()
+    finally:
+        decision_tree.canonical_positions, decision_tree.shared_table = saved
+
+
+def move_estimate(levels, fn, position, move):
+    """Estimate of our move at the root of the decision fn"""
+    [(child, args)] = [(child, args) for m, child, args
+                       in alphabeta.root_variants(fn, *position) if m == move]
+    if child is None:
+        return decision_tree.make_offense_decision(levels - 1, *args)[0]
+    return decision_tree.make_decision_fns(levels)[child](*args)[0]
+
+
+@given(st.integers(0, 2 ** len(CARDS) - 1), st.integers(0, 2 ** len(CARDS) - 1))
+def test_cardset_relation(cards1, cards2):
+    cards2 &= ~cards1
+    assert decision_tree.cardset_relation(cards1, cards2) == \
+        decision_tree.sorted_cardset_relation(cards1, cards2)
+
+
+@given(decisions(), st.integers(1, 2))
+@settings(deadline=None)
+def test_alphabeta(decision, levels):
+    fn, position = decision
+    assert plain(lambda: alphabeta.make_decision(levels, fn)(*position)) == \
+        plain(lambda: decision_tree.make_decision(levels, fn)(*position))
+    assert alphabeta.make_decision(levels, fn)(*position) == \
+        decision_tree.make_decision(levels, fn)(*position)
+
+
+@given(decisions(), st.integers(1, 2))
+@settings(deadline=None)
+def test_canonical_positions(decision, levels):
+    fn, position = decision
+    expected, expected_move = \
+        plain(lambda: decision_tree.make_decision(levels, fn)(*position))
+    est, move = decision_tree.make_decision(levels, fn)(*position)
+    assert est == expected
+    if move != expected_move and fn != 'rival_attacks':
+        # Of equally good moves, another one may come first in the canonical position
+        assert plain(lambda: move_estimate(levels, fn, position, move)) == est
+
+    decision_tree.shared_table = {}
+    try:
+        assert alphabeta.make_decision(levels, fn)(*position) == (est, move)
+        assert alphabeta.make_decision(levels, fn)(*position) == (est, move)
+    finally:
+        decision_tree.shared_table = None
+
+
+@given(positions())
+@settings(deadline=None)
+def test_instrumented_search(position):
+    expected = alphabeta.make_decision(2, 'i_attack')(*position)
+    decision_tree.stats = SearchStats()
+    try:
+        assert alphabeta.make_decision(2, 'i_attack')(*position) == expected
+    finally:
+        decision_tree.stats = None
+
+
+@given(positions())
+def test_canonical_restore(position):
+    packed, transform = canonical(position)
+    assert tuple(restore(transform, x) for x in unpack(packed, 4)) == position
+
+
+@given(positions(max_cards=7))
+@settings(deadline=None, max_examples=50)
+def test_endgame_move_values(position):
+    values = endgame.move_values('i_attack', position)
+    value, move = endgame.decision('i_attack', position, alphabeta.Budget())
+    assert value == max(values.values())
+    assert values[move] == value
@@ -0,0 +1,22 @@
+import random
+
+from cardset import CARDS
+from decision_tree import cardset_relation, sorted_cardset_relation
+
+
+def test_same_as_sorted():
+    rnd = random.Random(0)
+    for i in range(5000):
+        cards = rnd.sample(CARDS, rnd.randint(0, 24))
+        n = rnd.randint(0, len(cards))
+        cards1, cards2 = sum(cards[:n]), sum(cards[n:])
+        assert cardset_relation(cards1, cards2) == sorted_cardset_relation(cards1, cards2)
+
+
+def test_edge_cases():
+    assert cardset_relation(0, 0) == (0.5, 0.5)
+    assert cardset_relation(CARDS[0], 0) == (0.5, 0.5)
+    # Non-trumps of the same value
+    assert cardset_relation(CARDS[0] | CARDS[1], CARDS[2]) == (0.5, 0.5)
+    assert cardset_relation(CARDS[0], CARDS[3]) == (0.0, 1.0)
+    assert cardset_relation(CARDS[-1], CARDS[0] | CARDS[1]) == (1.0, 0.0)
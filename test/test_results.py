@@ -0,0 +1,32 @@
+from collections import Counter
+
+from results import Tally, StoppingRule, wilson_interval, append_record, read_records
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(50, 100, 1.96)
+    assert abs(low - 0.4038) < 1e-3 and abs(high - 0.5962) < 1e-3
+    assert wilson_interval(0, 10, 1.96)[0] == 0.0
+    assert wilson_interval(0, 0, 1.96) == (0.0, 1.0)
+
+
+def test_stopping_rule():
+    tally = Tally()
+    tally.update(Counter({True: 30, None: 10, False: 30}))
+    rule = StoppingRule(precision=0.05, separate=True, min_games=50)
+    assert rule.reason_to_stop(tally) is None
+    tally.update(Counter({True: 1000, False: 1000}))
+    assert rule.reason_to_stop(tally) == 'precision'
+    tally.update(Counter({True: 300}))
+    assert StoppingRule(separate=True).reason_to_stop(tally) == 'separated'
+
+
+def test_records(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    tally = Tally()
+    tally.update([True, True, None, False])
+    append_record(path, tally.record(1.96, run=1))
+    append_record(path, tally.record(1.96, run=2))
+    records = read_records(path)
+    assert [r['run'] for r in records] == [1, 2]
+    assert records[0]['wins'] == 2 and records[0]['score'] == 2 / 3
@@ -0,0 +1,51 @@
+import pickle
+
+import alphabeta
+import decision_tree
+from cardset import CARDS
+from common import Card, encoding
+from searchstats import SearchStats
+
+
+POSITION = (CARDS[0] | CARDS[5] | CARDS[30], CARDS[1] | CARDS[9] | CARDS[28], 0, 0)
+
+
+def test_counts(monkeypatch):
+    expected = alphabeta.make_decision(2, 'i_attack')(*POSITION)
+    stats = SearchStats()
+    monkeypatch.setattr(decision_tree, 'stats', stats)
+    stats.start_decision()
+    assert alphabeta.make_decision(2, 'i_attack')(*POSITION) == expected
+    stats.end_decision('i_attack', POSITION)
+
+    assert stats.decisions == {'i_attack': 1}
+    assert stats.nodes[('i_attack', 2)] >= 1
+    # Every node expanded was first missed in the cache
+    assert stats.total_nodes() == sum(stats.misses.values())
+    assert sum(stats.decision_nodes.values()) == 1
+    assert stats.slowest[0][1:] == ('i_attack', stats.total_nodes(), POSITION)
+
+    merged = SearchStats()
+    merged.update(pickle.loads(pickle.dumps(stats)))
+    merged.update(stats)
+    assert merged.total_nodes() == 2 * stats.total_nodes()
+    assert merged.decisions == {'i_attack': 2}
+    assert 'i_attack' in merged.report()
+
+
+def test_unbeatables_fanout(monkeypatch):
+    # Our 6s of clubs and diamonds are interchangeable: of the 4 subsets of them the
+    # search tries 3 distinct ones, and with cutoffs it stops at the 2nd, which wins.
+    # The other nodes, 1 level deep, have just the empty set.
+    enc = encoding('hearts')
+    c_off = enc.card(Card('clubs', 6)) | enc.card(Card('diamonds', 6)) | \
+        enc.card(Card('hearts', 14))
+    c_def = enc.card(Card('hearts', 6)) | enc.card(Card('hearts', 7)) | \
+        enc.card(Card('spades', 11))
+    position = c_off, c_def, enc.card(Card('spades', 8)), enc.card(Card('spades', 10))
+
+    for engine, fanout in ((decision_tree, {3: 1, 1: 3}), (alphabeta, {2: 1, 1: 1})):
+        stats = SearchStats()
+        monkeypatch.setattr(decision_tree, 'stats', stats)
+        engine.make_decision(2, 'i_put_unbeatables')(*position)
+        assert stats.fanout == fanout
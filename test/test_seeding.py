@@ -0,0 +1,20 @@
+import batch
+import dumb
+import smart
+from common import game_random, random_deck
+from game import rungame
+
+
+def test_game_random_is_reproducible():
+    assert random_deck(game_random(1, 5)) == random_deck(game_random(1, 5))
+    assert random_deck(game_random(1, 5)) != random_deck(game_random(1, 6))
+    assert random_deck(game_random(1, 5)) != random_deck(game_random(2, 5))
+
+
+def test_subset_replay():
+    results = [rungame(smart.scenario, dumb.scenario, game_random(7, i)) for i in range(20)]
+    assert [
+        rungame(smart.scenario, dumb.scenario, game_random(7, i)) for i in range(10, 20)
+    ] == results[10:]
+    decks, trumps = batch.deal(10, seed=7, first=10)
+    assert batch.play_batch(decks, batch.SMART, batch.DUMB) == results[10:]
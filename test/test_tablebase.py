@@ -0,0 +1,38 @@
+import random
+from itertools import islice
+
+import endgame
+import tablebase
+from alphabeta import Budget
+from cardset import CARDS
+
+
+def test_rank_is_perfect_hash():
+    offsets, count = tablebase._offsets(2)
+    assert count == 36 * 35 + 2 * 36 * 595 + 630 * 561
+    ranks = [tablebase.rank(c_off, c_def, offsets) for c_off, c_def in tablebase.positions(2)]
+    assert sorted(ranks) == list(range(count))
+
+
+def test_probe(tmp_path, monkeypatch):
+    path = str(tmp_path / 'tb')
+    tablebase.generate(path, 1)
+    tb = tablebase.Tablebase(path)
+    assert tb.K == 1
+    assert tb.probe(CARDS[0] | CARDS[1], CARDS[2]) is None
+    for c_off, c_def in islice(tablebase.positions(1), 0, None, 7):
+        assert tb.probe(c_off, c_def) == \
+            endgame.decision('i_attack', (c_off, c_def, 0, 0), Budget())
+
+    monkeypatch.setattr(endgame, 'tablebase', tb)
+    monkeypatch.setattr(endgame, 'solved', endgame.TranspositionTable())
+    rnd = random.Random(0)
+    for i in range(50):
+        cards = rnd.sample(CARDS, 3)
+        position = (cards[0], cards[1] | cards[2], 0, 0)
+        value = endgame.decision('i_attack', position, Budget())[0]
+        monkeypatch.setattr(endgame, 'tablebase', None)
+        monkeypatch.setattr(endgame, 'solved', endgame.TranspositionTable())
+        assert endgame.decision('i_attack', position, Budget())[0] == value
+        monkeypatch.setattr(endgame, 'tablebase', tb)
+    tb.close()
@@ -0,0 +1,29 @@
+from collections import Counter
+
+import pytest
+
+import dumb
+import smart
+from common import game_random
+from game import rungame
+from tournament import get_scenario, play_games, swapped
+
+
+def test_get_scenario():
+    assert get_scenario('dumb') is dumb.scenario
+    assert get_scenario('smartest-3').keywords == {'levels': 3}
+    with pytest.raises(ValueError):
+        get_scenario('smartest-x')
+
+
+def test_play_games():
+    expected = Counter(
+        rungame(smart.scenario, dumb.scenario, game_random(4, i)) for i in range(5, 25)
+    )
+    assert play_games('smart', 'dumb', 4, 5, 20) == expected
+    assert sum(play_games('smartest-1', 'dumb', 4, 5, 3).values()) == 3
+
+
+def test_swapped():
+    assert swapped(Counter({True: 3, None: 2, False: 1})) == \
+        Counter({False: 3, None: 2, True: 1})
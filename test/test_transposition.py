@@ -0,0 +1,42 @@
+from transposition import TranspositionTable
+
+
+def test_lru_eviction():
+    table = TranspositionTable(2)
+    table['a'] = 1
+    table['b'] = 2
+    assert table.get('a') == 1
+    table['c'] = 3
+    assert table.get('b') is None
+    assert table.get('a') == 1 and table.get('c') == 3
+    assert table.stats() == {
+        'size': 2, 'capacity': 2, 'hits': 3, 'misses': 1, 'evictions': 1
+    }
+
+    merged = TranspositionTable(2)
+    merged.add_counters(table.counters())
+    merged.add_counters(table.counters())
+    assert merged.counters() == {'hits': 6, 'misses': 2, 'evictions': 2}
+
+
+def test_fresh_entries():
+    table = TranspositionTable(10)
+    table['a'] = 1
+    table.track_fresh()
+    table['b'] = 2
+    table['b'] = 3
+    assert table.take_fresh() == [('b', 3)]
+    assert table.take_fresh() == []
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / 'table')
+    assert len(TranspositionTable.load(path)) == 0
+
+    table = TranspositionTable(10)
+    for i in range(5):
+        table[i] = (i, None)
+    table.save(path)
+
+    loaded = TranspositionTable.load(path, capacity=3)
+    assert list(loaded.entries.items()) == [(2, (2, None)), (3, (3, None)), (4, (4, None))]
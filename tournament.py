@@ -0,0 +1,179 @@
+"""Round-robin tournament between scenarios.
+
+Every pair of scenarios plays the same seeded deals twice, with the seats swapped, so
+that the luck of the deal mostly cancels out.  Run as:
+
+    python tournament.py dumb smart smartest-1 smartest-2 -N 1000
+"""
+
+import os
+import random
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from itertools import combinations
+
+import batch
+import dumb
+import endgame
+import ismcts
+import pimc
+import smart
+import smartest
+from common import game_random
+from game import rungame
+from main import schedule
+from results import Tally, Z_SCORES, append_record
+from tablebase import Tablebase
+
+try:
+    import lockstep
+except ImportError:  # no NumPy
+    lockstep = None
+
+
+# Scenario name -> scenario
+SCENARIOS = {
+    'dumb': dumb.scenario,
+    'smart': smart.scenario,
+    'smartest': smartest.scenario,
+    'pimc': pimc.scenario,
+    'ismcts': ismcts.scenario,
+}
+
+# "name-N" is the scenario with parameter = N: smartest searching N levels deep, pimc
+# trying N deals per move, ismcts making N iterations per move
+PARAMETERS = {
+    'smartest': 'levels',
+    'pimc': 'samples',
+    'ismcts': 'iterations',
+}
+
+
+def get_scenario(name):
+    if name in SCENARIOS:
+        return SCENARIOS[name]
+    base, sep, value = name.rpartition('-')
+    if base in PARAMETERS and value.isdigit():
+        return partial(SCENARIOS[base], **{PARAMETERS[base]: int(value)})
+    raise ValueError("Unknown scenario: {}".format(name))
+
+
+def play_games(name1, name2, seed, first, N):
+    """Play games first, ..., first + N - 1 of the run with seed, return Counter"""
+    if name1 in batch.POLICIES and name2 in batch.POLICIES:
+        if lockstep is not None:
+            return lockstep.run(
+                N, lockstep.POLICIES[name1], lockstep.POLICIES[name2], seed, first
+            )
+        return batch.run(N, batch.POLICIES[name1], batch.POLICIES[name2], seed, first)
+
+    scenario1, scenario2 = get_scenario(name1), get_scenario(name2)
+    return Counter(
+        rungame(scenario1, scenario2, game_random(seed, i)) for i in range(first, first + N)
+    )
+
+
+def swapped(results):
+    """Counter of results seen from the other seat"""
+    return Counter({
+        None if r is None else not r: n for r, n in results.items()
+    })
+
+
+def run_tournament(names, N, seed, workers=None):
+    """Play N deals for each pair of scenarios in both seats
+
+    :return: {(name1, name2): Tally of name1 against name2}, for all ordered pairs
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    tallies = {}
+    for name1, name2 in combinations(names, 2):
+        tallies[name1, name2] = Tally()
+        tallies[name2, name1] = Tally()
+
+    with ProcessPoolExecutor(workers) as exe:
+        futures = {}
+        for name1, name2 in combinations(names, 2):
+            for seats in ((name1, name2), (name2, name1)):
+                for start, n in schedule(0, N, workers):
+                    futures[exe.submit(play_games, *seats, seed, start, n)] = seats
+
+        for f in as_completed(futures):
+            name1, name2 = futures[f]
+            res = f.result()
+            tallies[name1, name2].update(res)
+            tallies[name2, name1].update(swapped(res))
+
+    return tallies
+
+
+def cross_table(names, tallies, z):
+    """Text table: the score of the row scenario against the column one"""
+    width = max(12, max(map(len, names)) + 1)
+    lines = [''.ljust(width) + ''.join(name.rjust(width) for name in names) + '   total']
+    for name1 in names:
+        cells, total = [], Tally()
+        for name2 in names:
+            if name1 == name2:
+                cells.append('-'.rjust(width))
+            else:
+                tally = tallies[name1, name2]
+                total.update(tally.results)
+                cells.append('{:.2%}'.format(tally.score()).rjust(width))
+        lines.append(
+            name1.ljust(width) + ''.join(cells) + '   {:.2%}'.format(total.score())
+        )
+
+    lines.append('')
+    for name1, name2 in combinations(names, 2):
+        lines.append('{} vs {}: {}'.format(
+            name1, name2, tallies[name1, name2].summary(z)
+        ))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('scenarios', nargs='+',
+                        help="scenario names: {}, smartest-N, pimc-N, ismcts-N".format(
+                            ', '.join(SCENARIOS)))
+    parser.add_argument('-N', type=int, default=1000,
+                        help="number of deals per pair, each played in both seats")
+    parser.add_argument('--seed', type=int,
+                        help="master seed of the deals; random and printed if not given")
+    parser.add_argument('--workers', type=int,
+                        help="number of worker processes, CPU count by default")
+    parser.add_argument('--confidence', type=float, default=0.95, choices=sorted(Z_SCORES))
+    parser.add_argument('--tablebase', metavar='FILE',
+                        help="tablebase of open positions (see `tablebase')")
+    parser.add_argument('--results', metavar='FILE',
+                        help="file to append the results of each pair to, as JSON lines")
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        get_scenario(name)
+    seed = args.seed
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    print("Seed", seed)
+
+    if args.tablebase:
+        endgame.tablebase = Tablebase(args.tablebase)
+
+    tallies = run_tournament(args.scenarios, args.N, seed, args.workers)
+    z = Z_SCORES[args.confidence]
+    print(cross_table(args.scenarios, tallies, z))
+
+    if args.results:
+        for name1, name2 in combinations(args.scenarios, 2):
+            append_record(args.results, tallies[name1, name2].record(
+                z, player1=name1, player2=name2, seed=seed, deals=args.N,
+                confidence=args.confidence,
+            ))
+
+
+if __name__ == '__main__':
+    main()
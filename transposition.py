@@ -0,0 +1,107 @@
+"""Transposition table for the decision tree.
+
+The table maps positions to the results of the decision tree search.  A position key is
+(function name, levels, position), see `decision_tree.cache_results_in'.  Card sets are
+trump-relative (see `cardset'), so the same key describes the same position for any
+trump and the table can be shared by all games.
+
+The table is bounded: when it is full, the least recently used entry is evicted.
+"""
+
+import os
+import pickle
+from collections import OrderedDict
+
+
+DEFAULT_CAPACITY = 500000
+
+
+class TranspositionTable:
+    # Counters of `stats', to be added up across tables (see `add_counters')
+    COUNTERS = 'hits', 'misses', 'evictions'
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.fresh = None  # keys added since the last `take_fresh', if tracked
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        entries = self.entries
+        if key not in entries:
+            if self.fresh is not None:
+                self.fresh.append(key)
+            if len(entries) >= self.capacity:
+                entries.popitem(last=False)
+                self.evictions += 1
+        entries[key] = value
+
+    def track_fresh(self):
+        """Start remembering added keys, to be collected with `take_fresh'"""
+        self.fresh = []
+
+    def take_fresh(self):
+        """Return the list of (key, value) pairs added since the previous call"""
+        entries = self.entries
+        items = [(key, entries[key]) for key in self.fresh if key in entries]
+        self.fresh = []
+        return items
+
+    def update(self, items):
+        for key, value in items:
+            self[key] = value
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def counters(self):
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def add_counters(self, counters):
+        """Add up the counters of another table (e.g. of a worker process)"""
+        for name, n in counters.items():
+            setattr(self, name, getattr(self, name) + n)
+
+    def report(self):
+        lookups = self.hits + self.misses
+        return "table: {size}/{capacity} entries, {hits} hits, {misses} misses " \
+               "({rate:.1%} hit rate), {evictions} evictions".format(
+                   rate=self.hits / lookups if lookups else 0.0, **self.stats())
+
+    def save(self, path):
+        """Save entries to the file, least recently used first"""
+        tmppath = path + '.tmp'
+        with open(tmppath, 'wb') as f:
+            pickle.dump(list(self.entries.items()), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmppath, path)
+
+    @classmethod
+    def load(cls, path, capacity=DEFAULT_CAPACITY):
+        """Load a table saved with `save'.  A missing file gives an empty table"""
+        table = cls(capacity)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                items = pickle.load(f)
+            del items[:max(0, len(items) - capacity)]
+            table.entries.update(items)
+        return table